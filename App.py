@@ -1,4 +1,5 @@
-from PyQt6.QtWidgets import (QApplication, QMainWindow, QStackedWidget, QMessageBox, QFileDialog)
+from PyQt6.QtWidgets import (QApplication, QMainWindow, QStackedWidget, QMessageBox, QFileDialog, QProgressDialog)
+from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QIcon, QAction
 import sys
 import os
@@ -12,6 +13,8 @@ from pages.home_page import HomePage
 from pages.PnL_page import PnLPage
 from pages.SensAN_page import SensANPage
 from pages.simul_page import SimulationPage
+from pages.workers import ProgressJob
+from chain_io import import_chain
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -53,6 +56,11 @@ class MainWindow(QMainWindow):
         # Show home page by default
         self.switch_page("home")
 
+        # File -> Import runs on the thread pool, see imprt
+        self.import_job = None
+        self.import_progress = None
+        self.chain = None  # the last imported chain, memory-mapped from the chain cache
+
     def create_menu_bar(self):
         menubar = self.menuBar()
 
@@ -97,26 +105,60 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "Error", "Page not found!")
 
     def imprt(self):
-        options = QFileDialog.Options()
-        options |= QFileDialog.ReadOnly
+        if self.import_job is not None:
+            QMessageBox.information(self, "Import Running", "Wait for the current import to finish or cancel it.")
+            return
+
         file_path, _ = QFileDialog.getOpenFileName(
             self,
             "Import Data File",
             "",
-            "CSV Files (*.csv);;Excel Files (*.xlsx *.xls);;All Files (*)",
-            options=options
+            "CSV Files (*.csv);;Excel Files (*.xlsx);;All Files (*)",
+            options=QFileDialog.Option.ReadOnly
         )
 
         if file_path:
-            try:
-                file_name = os.path.basename(file_path)
-                QMessageBox.information(self, "File Imported", f"Successfully imported: {file_name}")
-
-                # TODO: Load file into memory / pass to relevant page
-                print(f"Imported file path: {file_path}")
-
-            except Exception as e:
-                QMessageBox.critical(self, "Import Failed", f"Error: {str(e)}")
+            # the chain is priced chunk by chunk into <name>_priced.csv next to the file, see chain_io.import_chain
+            file_name = os.path.basename(file_path)
+            out_path = os.path.splitext(file_path)[0] + "_priced.csv"
+            self.import_job = ProgressJob(import_chain, file_path, out_path)
+
+            self.import_progress = QProgressDialog(f"Pricing {file_name}...", "Cancel", 0, 1000, self)
+            self.import_progress.setWindowTitle("Import")
+            self.import_progress.setWindowModality(Qt.WindowModality.WindowModal)
+            self.import_progress.setAutoClose(False)
+            self.import_progress.setAutoReset(False)
+            self.import_progress.canceled.connect(self.import_job.cancel)
+
+            self.import_job.signals.progress.connect(lambda fraction: self.import_progress.setValue(int(fraction*1000)))
+            self.import_job.signals.done.connect(self.import_finished)
+            self.import_job.start()
+            self.import_progress.show()
+
+    def import_finished(self, ok, result):
+        self.import_job = None
+        self.import_progress.close()
+        if not ok:
+            QMessageBox.critical(self, "Import Failed", f"Error: {result}")
+            return
+
+        file_name = os.path.basename(result['path'])
+        if result['chain'] is not None:
+            self.chain = result['chain']
+        lines = []
+        if result['cached']:
+            lines.append("Unchanged since the last import, loaded from the chain cache.")
+        lines += [f"Priced {result['priced']:,} of {result['rows']:,} rows "
+                 f"({result['calls']:,} calls, {result['puts']:,} puts)."]
+        if result['rejected']:
+            shown = ", ".join(map(str, result['bad_rows']))
+            lines.append(f"Rejected {result['rejected']:,} invalid rows (lines {shown}"
+                         f"{', ...' if result['rejected'] > len(result['bad_rows']) else ''}).")
+        if result['stopped']:
+            lines.append("The import was cancelled, the output holds the rows priced so far.")
+        if result['priced'] and os.path.exists(result['out_path']):
+            lines.append(f"Results written to {result['out_path']}")
+        QMessageBox.information(self, "File Imported", f"{file_name}\n\n" + "\n".join(lines))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,47 @@
+# Accuracy vs speed of the normal cdf/pdf backends in norm_backend, run from the repository root with
+#   python -m benchmarks.bench_norm_backend
+import timeit
+
+import numpy as np
+from scipy.stats import norm
+
+import main
+import norm_backend
+
+
+def max_cdf_error(name, x):
+    with norm_backend.use_backend(name):
+        return np.max(np.abs(norm_backend.cdf(x) - norm.cdf(x)))
+
+
+def time_call(func, number):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def run():
+    x_grid = np.linspace(-10, 10, 200001)
+    sizes = [1, 100, 10000, 1000000]
+    rng = np.random.default_rng(0)
+
+    print(f"{'backend':<8}{'max cdf err':>14}" + ''.join(f"{'cdf n=' + str(n):>16}" for n in sizes)
+          + f"{'model c_p+p_p':>16}")
+    for name in norm_backend.BACKENDS:
+        timings = []
+        for n in sizes:
+            x = float(rng.standard_normal()) if n == 1 else rng.standard_normal(n)
+            with norm_backend.use_backend(name):
+                timings.append(time_call(lambda: norm_backend.cdf(x), max(1, 100000 // n)))
+
+        def price_scalar():
+            model = main.BlackScholesModel(100.0, 95.0, 0.25, 0.03, 0.5)
+            return model.c_p, model.p_p
+
+        with norm_backend.use_backend(name):
+            model_time = time_call(price_scalar, 10000)
+
+        print(f"{name:<8}{max_cdf_error(name, x_grid):>14.2e}"
+              + ''.join(f"{t * 1e6:>14.2f}us" for t in timings) + f"{model_time * 1e6:>14.2f}us")
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,42 @@
+# Normal draw throughput of the numpy bit generators and of the model's simulators, run from the repository root
+# with
+#   python -m benchmarks.bench_rng
+import timeit
+
+import numpy as np
+
+import main
+
+BIT_GENERATORS = ('MT19937', 'PCG64', 'PCG64DXSM', 'Philox', 'SFC64')
+
+
+def time_call(func, number=5):
+    return min(timeit.repeat(func, number=number, repeat=5)) / number
+
+
+def run(n=1_000_000):
+    out = np.empty(n)
+    print(f"standard normal draws, n={n:,}")
+    print(f"{'generator':<28}{'ms':>8}{'M draws/s':>12}")
+    rows = [('np.random.normal (legacy)', lambda: np.random.normal(size=n)),
+            ('np.random.standard_normal', lambda: np.random.standard_normal(n))]
+    for name in BIT_GENERATORS:
+        rng = np.random.Generator(getattr(np.random, name)(0))
+        rows.append((f"Generator({name})", lambda rng=rng: rng.standard_normal(out=out)))
+    for label, func in rows:
+        seconds = time_call(func)
+        print(f"{label:<28}{seconds*1e3:>8.2f}{n/seconds/1e6:>12.1f}")
+
+    model = main.BlackScholesModel(100.0, 100.0, 0.2, 0.03, 1.0)
+    paths = np.empty((10000, 101))
+    rng = main.make_rng(0)
+    print()
+    print(f"{'simulator':<28}{'ms':>8}")
+    for label, func in [('gbm_paths 10000 x 100', lambda: model.gbm_paths(10000, 100, out=paths, rng=rng)),
+                        ('terminal_prices 1e6', lambda: model.terminal_prices(n, rng=rng)),
+                        ('c_pnl_edge_simul 1e6', lambda: model.c_pnl_edge_simul(model.c_p, 1, n, rng=rng))]:
+        print(f"{label:<28}{time_call(func)*1e3:>8.2f}")
+
+
+if __name__ == '__main__':
+    run()
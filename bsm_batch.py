@@ -0,0 +1,264 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import chain_io
+import parallel
+from chain import OptionChain, call_mask
+from implied_vol import implied_vol
+from main import BlackScholesModel
+
+# Headless batch pricer: python -m bsm_batch chain.csv -o priced.csv --outputs price,greeks,iv --workers 4
+#
+# The chain is read in chunks (see chain_io.read_chunks), every chunk is priced with the vectorized models and
+# written out before the next one is read, so memory is bounded by the chunk size. With --workers N the price,
+# greeks and implied vols of every chunk are sharded over N processes with parallel.price_chain and
+# parallel.implied_vols: the columns go through shared memory, nothing is pickled. Nothing here imports Qt,
+# matplotlib or superqt, it runs on machines without a display.
+#
+# Outputs (comma separated):
+#   price      model price of every option
+#   greeks     delta, gamma, vega, theta and rho
+#   iv         implied vol of the quote column (and iv_converged), the file needs a quote column, rows with a
+#              blank quote are still priced and get iv nan
+#   breakeven  the underlying price at expiry where the option bought at the model price breaks even
+#   pnl        the closed-form P&L distribution at expiry of one option bought at the quote (the model price
+#              where there is no quote column or no quote): prob_profit, expected_pnl, pnl_std and the
+#              pnl_q05, pnl_q50 and pnl_q95 quantiles, drift r
+# Formats: csv, or npz (one array per column, np.load(path)['price']).
+
+OUTPUTS = ('price', 'greeks', 'iv', 'breakeven', 'pnl')
+GREEKS = ('delta', 'gamma', 'vega', 'theta', 'rho')
+PNL_QUANTILES = {'pnl_q05': 0.05, 'pnl_q50': 0.5, 'pnl_q95': 0.95}
+FORMATS = ('csv', 'npz')
+
+
+def required_columns(outputs):
+    # the columns the file must have: iv only needs the quote, everything else prices with the sigma column.
+    # A row only needs the model inputs (row_columns), a row without a quote still gets its price and greeks
+    # and iv=nan, iv_converged=False
+    required = ['S', 'K', 'r', 't']
+    if set(outputs) & {'price', 'greeks', 'breakeven', 'pnl'}:
+        required.insert(2, 'sigma')
+    if 'iv' in outputs:
+        required.append(chain_io.QUOTE_COLUMN)
+    return tuple(required)
+
+
+def row_columns(required):
+    return tuple(column for column in required if column != chain_io.QUOTE_COLUMN)
+
+
+def price_columns(columns, outputs, dtype=np.float64, workers=1, pool=None):
+    # prices one chunk given as a dict of column arrays, returns the input columns followed by the outputs
+    # with workers > 1 the model prices and implied vols are computed in the processes of pool
+    n = len(columns['S'])
+    block_size = max(-(-n//workers), 1)
+    option_type = columns[chain_io.TYPE_COLUMN] if chain_io.TYPE_COLUMN in columns else 'c'
+    is_call = call_mask(np.char.strip(np.asarray(option_type, dtype=str)), n)
+    result = dict(columns)
+    result[chain_io.TYPE_COLUMN] = np.where(is_call, 'c', 'p')
+    if set(outputs) & {'price', 'greeks', 'breakeven', 'pnl'}:
+        model = [columns[c] for c in ('S', 'K', 'sigma', 'r', 't')]
+        if workers > 1:
+            priced = parallel.price_chain(*model, is_call, dtype, workers, block_size, pool)
+        else:
+            priced = OptionChain(*model, is_call, dtype).price()
+        if 'price' in outputs:
+            result['price'] = priced['price']
+        if 'greeks' in outputs:
+            for greek in GREEKS:
+                result[greek] = priced[greek]
+        if 'breakeven' in outputs:
+            # K + premium for calls, K - premium for puts
+            result['breakeven'] = np.asarray(columns['K'], dtype=dtype) + np.where(is_call, 1, -1)*priced['price']
+        if 'pnl' in outputs:
+            premium = priced['price']
+            if chain_io.QUOTE_COLUMN in columns:
+                quote = columns[chain_io.QUOTE_COLUMN]
+                premium = np.where(np.isfinite(quote), quote, premium)
+            result.update(pnl_columns(columns, premium, is_call, dtype))
+    if 'iv' in outputs:
+        quoted = [columns[c] for c in (chain_io.QUOTE_COLUMN, 'S', 'K', 'r', 't')]
+        if workers > 1:
+            solved = parallel.implied_vols(*quoted, is_call, workers, block_size, pool)
+            iv, converged = solved['iv'], solved['iv_converged']
+        else:
+            iv, converged = implied_vol(*quoted, is_call)
+        result['iv'] = iv.astype(dtype, copy=False)
+        result['iv_converged'] = converged
+    return result
+
+
+def pnl_columns(columns, premium, is_call, dtype=np.float64):
+    # closed-form P&L statistics of the chunk, calls and puts evaluated on the whole chunk and merged by type
+    model = BlackScholesModel(*(np.asarray(columns[c], dtype=np.float64) for c in ('S', 'K', 'sigma', 'r', 't')))
+
+    def by_type(statistic):
+        return np.where(is_call, statistic('c'), statistic('p')).astype(dtype, copy=False)
+
+    result = {
+        'prob_profit': by_type(lambda o: model.pnl_prob_profit(premium, o)),
+        'expected_pnl': by_type(lambda o: model.pnl_expected(premium, 1, o)),
+        'pnl_std': by_type(lambda o: model.pnl_std(premium, 1, o)),
+    }
+    for name, q in PNL_QUANTILES.items():
+        result[name] = by_type(lambda o: model.pnl_quantile(q, premium, 1, o))
+    return result
+
+
+class CsvWriter:
+
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, columns):
+        import pandas as pd
+        pd.DataFrame(columns).to_csv(self.path, mode='w' if self.first else 'a', header=self.first, index=False)
+        self.first = False
+
+    def close(self):
+        if self.first:
+            open(self.path, 'w').close()
+
+    def abort(self):
+        if not self.first and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class NpzWriter:
+    # every column is spooled to a raw temporary file and copied into its .npy member once the row count is
+    # known, so the npz is written without holding the whole result in memory
+    def __init__(self, path):
+        self.path = path
+        self.tmp = tempfile.TemporaryDirectory(prefix='bsm_batch.', dir=os.path.dirname(os.path.abspath(path)))
+        self.files = {}
+        self.dtypes = {}
+        self.rows = 0
+
+    def write(self, columns):
+        for name, values in columns.items():
+            values = np.asarray(values)
+            if name not in self.files:
+                self.files[name] = open(os.path.join(self.tmp.name, name), 'w+b')
+                self.dtypes[name] = values.dtype
+            self.files[name].write(np.ascontiguousarray(values, dtype=self.dtypes[name]).tobytes())
+        self.rows += len(next(iter(columns.values())))
+
+    def close(self):
+        with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+            for name, f in self.files.items():
+                header = {'descr': np.lib.format.dtype_to_descr(self.dtypes[name]), 'fortran_order': False,
+                          'shape': (self.rows,)}
+                with archive.open(f"{name}.npy", 'w', force_zip64=True) as member:
+                    np.lib.format.write_array_header_2_0(member, header)
+                    f.seek(0)
+                    while block := f.read(1 << 24):
+                        member.write(block)
+                f.close()
+        self.tmp.cleanup()
+
+    def abort(self):
+        for f in self.files.values():
+            f.close()
+        self.tmp.cleanup()
+
+
+def run(path, out_path, outputs=('price', 'greeks'), fmt='csv', workers=1, chunksize=100_000, dtype=np.float64,
+        log=None):
+    """Price the chain file at path into out_path, returns a summary dict (rows, priced, rejected, seconds)"""
+    started = time.perf_counter()
+    required = required_columns(outputs)
+    writer = NpzWriter(out_path) if fmt == 'npz' else CsvWriter(out_path)
+    summary = {'rows': 0, 'priced': 0, 'rejected': 0}
+
+    def chunks():
+        for frame, done, total in chain_io.read_chunks(path, chunksize, dtype, required):
+            valid = chain_io.valid_rows(frame, row_columns(required))
+            summary['rows'] += len(valid)
+            summary['rejected'] += int((~valid).sum())
+            frame = frame[valid]
+            if len(frame):
+                columns = {column: frame[column].to_numpy() for column in frame.columns}
+                if chain_io.TYPE_COLUMN in columns:
+                    # a blank type is a call, as in chain_io.price_frame
+                    columns[chain_io.TYPE_COLUMN] = frame[chain_io.TYPE_COLUMN].fillna('c').to_numpy(dtype=str)
+                yield columns
+            if log is not None:
+                log(f"{summary['rows']:,} rows read ({done/total:.0%})")
+
+    def write(result):
+        summary['priced'] += len(result['S'])
+        writer.write(result)
+
+    try:
+        if workers > 1:
+            # one pool for the whole file, every chunk is split into one block per worker
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for columns in chunks():
+                    write(price_columns(columns, outputs, dtype, workers, pool))
+        else:
+            for columns in chunks():
+                write(price_columns(columns, outputs, dtype))
+    except BaseException:
+        # no half-written output
+        writer.abort()
+        raise
+    writer.close()
+    summary['seconds'] = time.perf_counter() - started
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m bsm_batch',
+                                     description="Price an option chain file (csv or xlsx) with the Black-Scholes model.")
+    parser.add_argument('input', help="chain file with S, K, sigma, r, t columns (optional type and quote columns)")
+    parser.add_argument('-o', '--output', help="output file (default: <input>_priced.<format>)")
+    parser.add_argument('--outputs', default='price,greeks',
+                        help=f"comma separated subset of {','.join(OUTPUTS)} (default: price,greeks)")
+    parser.add_argument('--format', choices=FORMATS, help="output format (default: from the output extension, else csv)")
+    parser.add_argument('--workers', type=int, default=1, help="number of pricing processes (default: 1)")
+    parser.add_argument('--chunksize', type=int, default=100_000, help="rows per chunk (default: 100000)")
+    parser.add_argument('--dtype', choices=('float64', 'float32'), default='float64')
+    parser.add_argument('-q', '--quiet', action='store_true', help="no progress output")
+    args = parser.parse_args(argv)
+
+    outputs = tuple(o.strip() for o in args.outputs.split(',') if o.strip())
+    unknown = [o for o in outputs if o not in OUTPUTS]
+    if unknown or not outputs:
+        parser.error(f"unknown output(s) {', '.join(unknown)}, choose from {', '.join(OUTPUTS)}")
+    args.outputs = outputs
+    if args.format is None:
+        extension = os.path.splitext(args.output or '')[1].lower().lstrip('.')
+        args.format = extension if extension in FORMATS else 'csv'
+    if args.output is None:
+        args.output = f"{os.path.splitext(args.input)[0]}_priced.{args.format}"
+    if args.workers < 1 or args.chunksize < 1:
+        parser.error("--workers and --chunksize must be at least 1")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log = None if args.quiet else (lambda message: print(message, file=sys.stderr))
+    try:
+        summary = run(args.input, args.output, args.outputs, args.format, args.workers, args.chunksize,
+                      np.dtype(args.dtype), log)
+    except (chain_io.ChainImportError, OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    rate = summary['rows']/summary['seconds'] if summary['seconds'] else 0
+    print(f"priced {summary['priced']:,} of {summary['rows']:,} rows ({summary['rejected']:,} rejected) "
+          f"in {summary['seconds']:.2f}s ({rate:,.0f} rows/s) -> {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,72 @@
+import numpy as np
+
+import norm_backend
+
+
+OPTION_TYPES = ('c', 'p', 'call', 'put')
+
+
+def call_mask(option_type, n):
+    # option_type can be a single 'c'/'p' ('call'/'put'), an array of those strings or a boolean array (True = call)
+    # the strings are matched case-insensitively after stripping whitespace, anything else raises
+    option_type = np.asarray(option_type)
+    if option_type.dtype == bool:
+        mask = option_type
+    elif option_type.dtype.kind in 'US':
+        names = np.char.lower(np.char.strip(option_type.astype(str)))
+        known = np.isin(names, OPTION_TYPES)
+        if not known.all():
+            unknown = ', '.join(repr(str(name)) for name in np.unique(option_type[~known])[:5])
+            raise ValueError(f"unknown option type(s) {unknown}, expected one of {', '.join(OPTION_TYPES)}")
+        mask = np.isin(names, ('c', 'call'))
+    else:
+        raise ValueError("option_type must be 'c'/'p', 'call'/'put' or a boolean array (True = call)")
+    return np.broadcast_to(mask, (n,))
+
+
+class OptionChain:
+    # struct-of-arrays layout: every field is one contiguous column with one entry per contract
+    __slots__ = ('S', 'K', 'sigma', 'r', 't', 'is_call', 'dtype')
+
+    def __init__(self, S, K, sigma, r, t, option_type='c', dtype=np.float64):
+        # scalars are broadcast against the columns, so a chain with a single r or t needs no copies
+        # dtype=np.float32 halves the memory of every column and every intermediate
+        self.dtype = np.dtype(dtype)
+        columns = np.broadcast_arrays(*(np.asarray(c, dtype=self.dtype) for c in (S, K, sigma, r, t)))
+        self.S, self.K, self.sigma, self.r, self.t = (np.atleast_1d(c) for c in columns)
+        self.is_call = call_mask(option_type, len(self))
+
+    def __len__(self):
+        return self.S.shape[0]
+
+    def price(self):
+        # one pass over the chain: d1/d2, the discount factor and the cdf/pdf values are computed once
+        # and shared by the price and every greek
+        S, K, sigma, r, t = self.S, self.K, self.sigma, self.r, self.t
+        # w = +1 for calls and -1 for puts turns both payoffs into one formula
+        w = np.where(self.is_call, 1, -1).astype(self.dtype)
+
+        sqrt_t = np.sqrt(t)
+        sig_sqrt_t = sigma * sqrt_t
+        d_1 = (np.log(S / K) + (r + 0.5 * sigma ** 2) * t) / sig_sqrt_t
+        d_2 = d_1 - sig_sqrt_t
+        k_disc = K * np.exp(-r * t)
+
+        cdf_1 = norm_backend.cdf(w * d_1).astype(self.dtype, copy=False)
+        cdf_2 = norm_backend.cdf(w * d_2).astype(self.dtype, copy=False)
+        pdf_1 = norm_backend.pdf(d_1).astype(self.dtype, copy=False)
+
+        price = w * (S * cdf_1 - k_disc * cdf_2)
+        delta = w * cdf_1
+        gamma = pdf_1 / (S * sig_sqrt_t)
+        vega = S * sqrt_t * pdf_1
+        theta = -(S * sigma * pdf_1) / (2 * sqrt_t) - w * r * k_disc * cdf_2
+        rho = w * t * k_disc * cdf_2
+
+        return {'price': price, 'delta': delta, 'gamma': gamma, 'vega': vega, 'theta': theta, 'rho': rho,
+                'd_1': d_1, 'd_2': d_2}
+
+
+def price_chain(S, K, sigma, r, t, option_type='c', dtype=np.float64):
+    # prices and greeks of a whole chain given as columns, see OptionChain
+    return OptionChain(S, K, sigma, r, t, option_type, dtype).price()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+# Columnar on-disk cache of imported (and priced) option chains, so re-opening a file skips parsing it.
+#
+# Every chain is a directory named after the source file's key with one raw little-endian .bin file per column
+# and a manifest.json holding the dtypes, the row count and the import summary. Loading maps the column files
+# with np.memmap (read-only), nothing is copied or parsed, the OS page cache is shared by every process that
+# opens the same chain. The key hashes the absolute path, size, mtime and a sample of the content, so an edited
+# file misses the cache. Entries are written to a temporary directory that is renamed into place once complete,
+# a crash or a cancelled import never leaves a half-written entry behind.
+#
+# The cache lives in $BSM_CACHE_DIR, or ~/.cache/bsm/chains if it is not set.
+
+CACHE_VERSION = 1
+SAMPLE_BYTES = 1 << 16
+
+
+def cache_dir():
+    path = os.environ.get('BSM_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'bsm', 'chains')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def file_key(path):
+    # sha1 of the absolute path, size, mtime and the first and last 64 KiB of the file
+    stat = os.stat(path)
+    digest = hashlib.sha1()
+    digest.update(f"{CACHE_VERSION}|{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(SAMPLE_BYTES))
+        if stat.st_size > SAMPLE_BYTES:
+            f.seek(max(stat.st_size - SAMPLE_BYTES, SAMPLE_BYTES))
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class CachedChain:
+    """Memory-mapped columns of one cached chain, columns are read-only arrays accessed as chain['price']"""
+    __slots__ = ('path', 'manifest', 'columns')
+
+    def __init__(self, path, manifest, columns):
+        self.path = path
+        self.manifest = manifest
+        self.columns = columns
+
+    def __len__(self):
+        return self.manifest['rows']
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    def __contains__(self, column):
+        return column in self.columns
+
+    @property
+    def summary(self):
+        return self.manifest['summary']
+
+    def option_chain(self):
+        # the model inputs as a chain.OptionChain, the columns are used in place
+        from chain import OptionChain
+        return OptionChain(*(self.columns[c] for c in ('S', 'K', 'sigma', 'r', 't')),
+                           option_type=self.columns['is_call'], dtype=self.columns['S'].dtype)
+
+
+class CacheWriter:
+    """Appends column chunks to a new cache entry, commit() publishes it, abort() throws it away"""
+
+    def __init__(self, key, source):
+        self.key = key
+        self.source = source
+        self.root = cache_dir()
+        self.tmp = tempfile.mkdtemp(prefix=f".{key}.", dir=self.root)
+        self.files = {}
+        self.dtypes = {}
+        self.rows = 0
+
+    def append(self, columns):
+        n = None
+        for name, values in columns.items():
+            values = np.ascontiguousarray(values)
+            values = values.astype(values.dtype.newbyteorder('<'), copy=False)
+            if name not in self.files:
+                self.files[name] = open(os.path.join(self.tmp, f"{name}.bin"), 'wb')
+                self.dtypes[name] = values.dtype.str
+            elif values.dtype.str != self.dtypes[name]:
+                values = values.astype(self.dtypes[name])
+            self.files[name].write(values.tobytes())
+            n = len(values)
+        self.rows += n or 0
+
+    def _close(self):
+        for f in self.files.values():
+            f.close()
+
+    def commit(self, summary):
+        self._close()
+        stat = os.stat(self.source)
+        manifest = {'version': CACHE_VERSION, 'source': os.path.abspath(self.source), 'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns, 'rows': self.rows, 'dtypes': self.dtypes, 'summary': summary}
+        with open(os.path.join(self.tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f)
+        final = os.path.join(self.root, self.key)
+        if os.path.isdir(final):
+            # an entry of the same file written with other dtypes (or by another process just now), mappings
+            # of the old files that are still open stay valid
+            shutil.rmtree(final, ignore_errors=True)
+        try:
+            os.replace(self.tmp, final)
+        except OSError:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+        prune(manifest['source'], keep=self.key)
+        return final
+
+    def abort(self):
+        self._close()
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+def load(source):
+    # the cached chain of the file at source, None if there is no valid entry for its current contents
+    entry = os.path.join(cache_dir(), file_key(source))
+    try:
+        with open(os.path.join(entry, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('version') != CACHE_VERSION:
+        return None
+    rows = manifest['rows']
+    columns = {}
+    for name, dtype in manifest['dtypes'].items():
+        column_path = os.path.join(entry, f"{name}.bin")
+        dtype = np.dtype(dtype)
+        try:
+            if os.path.getsize(column_path) != rows*dtype.itemsize:
+                return None
+        except OSError:
+            return None
+        # np.memmap cannot map an empty file
+        columns[name] = np.memmap(column_path, dtype=dtype, mode='r', shape=(rows,)) if rows else np.empty(0, dtype)
+    return CachedChain(entry, manifest, columns)
+
+
+def prune(source, keep=None):
+    # drop the entries written for earlier versions of the file at source (the path is in their manifest)
+    root = cache_dir()
+    for key in os.listdir(root):
+        if key == keep or key.startswith('.'):
+            continue
+        try:
+            with open(os.path.join(root, key, 'manifest.json')) as f:
+                if json.load(f).get('source') != source:
+                    continue
+        except (OSError, ValueError):
+            continue
+        shutil.rmtree(os.path.join(root, key), ignore_errors=True)
+
+
+def evict(source):
+    # drop the cache entry of the file at source, if there is one
+    shutil.rmtree(os.path.join(cache_dir(), file_key(source)), ignore_errors=True)
@@ -0,0 +1,244 @@
+import os
+
+import numpy as np
+
+import chain_cache
+from chain import OPTION_TYPES, OptionChain
+
+# Streaming option-chain import: the file is read in fixed-size chunks with explicit dtypes, every chunk is
+# validated, priced through the vectorized OptionChain and appended to the output file before the next one is
+# read, so memory stays at a few chunks whatever the file size. pandas (and openpyxl for .xlsx files) are only
+# imported when a file is actually read. The priced columns are also written to the columnar cache (see
+# chain_cache.py), importing the same unchanged file again maps the cached columns instead of parsing it.
+
+REQUIRED_COLUMNS = ('S', 'K', 'sigma', 'r', 't')
+QUOTE_COLUMN = 'quote'  # optional market price of the option, for implied vols
+NUMERIC_COLUMNS = REQUIRED_COLUMNS + (QUOTE_COLUMN,)
+TYPE_COLUMN = 'type'
+OUTPUT_COLUMNS = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')
+CACHE_COLUMNS = REQUIRED_COLUMNS + ('is_call',) + OUTPUT_COLUMNS
+
+# accepted header spellings (case-insensitive) for every column
+ALIASES = {
+    'S': ('s', 'spot', 'underlying', 'underlying_price'),
+    'K': ('k', 'strike', 'strike_price'),
+    'sigma': ('sigma', 'vol', 'volatility', 'iv'),
+    'r': ('r', 'rate', 'interest_rate'),
+    't': ('t', 'expiry', 'time', 'time_to_expiry', 'maturity'),
+    QUOTE_COLUMN: ('quote', 'market_price', 'mid', 'premium', 'option_price'),
+    TYPE_COLUMN: ('type', 'option_type', 'cp', 'call_put'),
+}
+
+
+class ChainImportError(ValueError):
+    pass
+
+
+def resolve_columns(header, required=REQUIRED_COLUMNS):
+    # maps the file's header names onto the model columns, raises if a required column is missing
+    lookup = {str(name).strip().lower(): name for name in header}
+    columns = {}
+    for column, names in ALIASES.items():
+        for name in names:
+            if name in lookup:
+                columns[column] = lookup[name]
+                break
+    missing = [column for column in required if column not in columns]
+    if missing:
+        raise ChainImportError(f"missing column(s) {', '.join(missing)}, the file has {', '.join(map(str, header))}")
+    return columns
+
+
+def _csv_chunks(path, chunksize, dtype, required):
+    import pandas as pd
+
+    try:
+        header = pd.read_csv(path, nrows=0).columns
+    except pd.errors.EmptyDataError:
+        raise ChainImportError("the file is empty") from None
+    columns = resolve_columns(header, required)
+    total = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        # every column is read as text, the numeric ones are coerced per chunk: a cell that is not a number
+        # becomes nan and only rejects its own row, like an empty cell
+        reader = pd.read_csv(f, usecols=list(columns.values()), dtype=str, chunksize=chunksize)
+        for frame in reader:
+            frame = _coerce_numeric(pd, frame.rename(columns={v: k for k, v in columns.items()}), dtype)
+            # the reader works on a buffered handle, so the position is the progress up to one buffer
+            yield frame, min(f.tell(), total), total
+
+
+def _excel_chunks(path, chunksize, dtype, required):
+    import pandas as pd
+    try:
+        import openpyxl
+    except ImportError:
+        raise ChainImportError("reading Excel files needs openpyxl (pip install openpyxl)") from None
+
+    # read-only mode streams the sheet row by row instead of loading the workbook into memory
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            raise ChainImportError("the sheet is empty")
+        columns = resolve_columns(header, required)
+        index = {column: header.index(name) for column, name in columns.items()}
+        total = max((sheet.max_row or 1) - 1, 1)
+        done = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == chunksize:
+                done += len(batch)
+                yield _excel_frame(pd, batch, index, dtype), done, total
+                batch = []
+        if batch:
+            done += len(batch)
+            yield _excel_frame(pd, batch, index, dtype), total, total
+    finally:
+        workbook.close()
+
+
+def _coerce_numeric(pd, frame, dtype):
+    # the model columns as dtype, anything that doesn't parse as a number is nan and rejected by valid_rows
+    for column in NUMERIC_COLUMNS:
+        if column in frame:
+            frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(dtype)
+    return frame
+
+
+def _excel_frame(pd, batch, index, dtype):
+    frame = pd.DataFrame({column: [row[i] for row in batch] for column, i in index.items()})
+    return _coerce_numeric(pd, frame, dtype)
+
+
+def read_chunks(path, chunksize=100_000, dtype=np.float64, required=REQUIRED_COLUMNS):
+    # yields (frame, done, total) with the model columns renamed to S, K, sigma, r, t (and type and quote if the
+    # file has them), done/total is the progress in bytes for csv and in rows for Excel
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.xlsx':
+        return _excel_chunks(path, chunksize, dtype, required)
+    if extension in ('.xls', '.xlsm'):
+        raise ChainImportError(f"{extension} files are not supported, save the sheet as .xlsx or .csv")
+    return _csv_chunks(path, chunksize, dtype, required)
+
+
+def valid_rows(frame, required=REQUIRED_COLUMNS):
+    # rows the model can price: every required input finite, S, K, sigma and t positive, a known option type
+    # if given
+    values = frame[list(required)].to_numpy()
+    valid = np.isfinite(values).all(axis=1)
+    positive = [column for column in ('S', 'K', 'sigma', 't') if column in required]
+    with np.errstate(invalid='ignore'):
+        valid &= (frame[positive].to_numpy() > 0).all(axis=1)
+    if TYPE_COLUMN in frame:
+        option_type = frame[TYPE_COLUMN].fillna('c').str.strip().str.lower()
+        valid &= option_type.isin(OPTION_TYPES).to_numpy()
+    return valid
+
+
+def price_frame(frame, dtype=np.float64):
+    # the frame with the price and greek columns appended and the call mask, rows without a type column are calls
+    option_type = frame[TYPE_COLUMN].fillna('c').str.strip().to_numpy(dtype=str) if TYPE_COLUMN in frame else 'c'
+    chain = OptionChain(*(frame[c].to_numpy() for c in REQUIRED_COLUMNS), option_type=option_type, dtype=dtype)
+    priced = chain.price()
+    return frame.assign(**{column: priced[column] for column in OUTPUT_COLUMNS}), chain.is_call
+
+
+def export_csv(cached, out_path, chunksize=100_000, progress=None, stop=None):
+    # writes a cached chain back out as priced csv, chunk by chunk
+    import pandas as pd
+
+    rows = len(cached)
+    for start in range(0, max(rows, 1), chunksize):
+        stop_row = min(start + chunksize, rows)
+        frame = pd.DataFrame({column: cached[column][start:stop_row] for column in REQUIRED_COLUMNS})
+        frame.insert(len(REQUIRED_COLUMNS), TYPE_COLUMN, np.where(cached['is_call'][start:stop_row], 'c', 'p'))
+        for column in OUTPUT_COLUMNS:
+            frame[column] = cached[column][start:stop_row]
+        frame.to_csv(out_path, mode='w' if start == 0 else 'a', header=start == 0, index=False)
+        if progress is not None:
+            progress(stop_row, rows)
+        if stop is not None and stop.is_set():
+            break
+
+
+def import_chain(path, out_path=None, chunksize=100_000, dtype=np.float64, progress=None, stop=None,
+                 max_bad_rows=20, use_cache=True):
+    """Validate and price an option-chain file chunk by chunk
+
+    path is a .csv or .xlsx file with S, K, sigma, r and t columns (see ALIASES for other accepted headers) and an
+    optional type column ('c'/'p', 'call'/'put'). The priced rows are appended to out_path as csv if it is given.
+    progress(done, total) is called after every chunk, stop is anything with is_set() (e.g. a threading.Event)
+    and ends the import after the current chunk. Returns a summary dict: rows read, priced, rejected, the line
+    numbers of the first max_bad_rows rejected rows, price totals for calls and puts and whether it was stopped.
+    With use_cache the summary also holds the priced chain as a chain_cache.CachedChain under 'chain' (None if the
+    import was stopped) and 'cached' tells whether it was mapped from the cache instead of parsed; on a cache hit
+    out_path is only written if it does not exist yet.
+    """
+    if use_cache:
+        cached = chain_cache.load(path)
+        if cached is not None and cached['S'].dtype == np.dtype(dtype):
+            if out_path is not None and not os.path.exists(out_path):
+                export_csv(cached, out_path, chunksize, progress, stop)
+            elif progress is not None:
+                progress(1, 1)
+            return dict(cached.summary, path=path, out_path=out_path, cached=True, chain=cached)
+        writer = chain_cache.CacheWriter(chain_cache.file_key(path), path)
+    else:
+        writer = None
+
+    try:
+        summary = _import_chunks(path, out_path, chunksize, dtype, progress, stop, max_bad_rows, writer)
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+    if writer is not None:
+        if summary['stopped']:
+            writer.abort()
+            summary.update(cached=False, chain=None)
+        else:
+            writer.commit(summary)
+            summary.update(cached=False, chain=chain_cache.load(path))
+    return summary
+
+
+def _import_chunks(path, out_path, chunksize, dtype, progress, stop, max_bad_rows, writer):
+    summary = {'path': path, 'out_path': out_path, 'rows': 0, 'priced': 0, 'rejected': 0, 'bad_rows': [],
+               'calls': 0, 'puts': 0, 'call_value': 0.0, 'put_value': 0.0, 'stopped': False}
+    if out_path is not None and os.path.exists(out_path):
+        os.remove(out_path)
+    first = True
+    for frame, done, total in read_chunks(path, chunksize, dtype):
+        valid = valid_rows(frame)
+        if not valid.all():
+            bad = np.flatnonzero(~valid)
+            room = max_bad_rows - len(summary['bad_rows'])
+            # line numbers in the file, the header is line 1
+            summary['bad_rows'].extend((summary['rows'] + bad[:room] + 2).tolist())
+            frame = frame[valid]
+        summary['rows'] += len(valid)
+        summary['rejected'] += int((~valid).sum())
+        if len(frame):
+            priced, is_call = price_frame(frame, dtype)
+            price = priced['price'].to_numpy()
+            summary['priced'] += len(priced)
+            summary['calls'] += int(is_call.sum())
+            summary['puts'] += int((~is_call).sum())
+            summary['call_value'] += float(price[is_call].sum())
+            summary['put_value'] += float(price[~is_call].sum())
+            if out_path is not None:
+                priced.to_csv(out_path, mode='w' if first else 'a', header=first, index=False)
+                first = False
+            if writer is not None:
+                writer.append({column: is_call if column == 'is_call' else priced[column].to_numpy()
+                               for column in CACHE_COLUMNS})
+        if progress is not None:
+            progress(done, total)
+        if stop is not None and stop.is_set():
+            summary['stopped'] = True
+            break
+    return summary
@@ -0,0 +1,145 @@
+import numpy as np
+
+import norm_backend
+from main import BlackScholesModel, make_rng
+from mc_stats import RunningStats
+from variance_reduction import control_beta, control_variate
+
+# Path-dependent payoffs priced by Monte Carlo on the model's GBM paths.
+#
+# A payoff maps a block of paths, shape (n_paths, n_steps + 1) as returned by BlackScholesModel.gbm_paths with
+# column 0 the spot, to one payoff per path. The path is monitored at the n_steps simulated dates, so barrier and
+# lookback prices are those of the discretely monitored contract and converge to the continuous one as n_steps
+# grows. Every payoff comes with a control variate of known expectation computed on the same paths: the
+# geometric average option for the Asian (closed form below) and the European option for the others.
+
+PAYOFFS = ('asian', 'barrier', 'lookback')
+BARRIER_TYPES = ('up-and-out', 'up-and-in', 'down-and-out', 'down-and-in')
+LOOKBACK_STRIKES = ('fixed', 'floating')
+
+
+def vanilla_payoff(paths, K, option_type='c'):
+    S_T = paths[:, -1]
+    return np.maximum(S_T - K, 0) if option_type == 'c' else np.maximum(K - S_T, 0)
+
+
+def asian_payoff(paths, K, option_type='c'):
+    # arithmetic average over the monitoring dates, the spot at time 0 is not one of them
+    average = paths[:, 1:].mean(axis=1)
+    return np.maximum(average - K, 0) if option_type == 'c' else np.maximum(K - average, 0)
+
+
+def geometric_asian_payoff(paths, K, option_type='c'):
+    average = np.exp(np.log(paths[:, 1:]).mean(axis=1))
+    return np.maximum(average - K, 0) if option_type == 'c' else np.maximum(K - average, 0)
+
+
+def barrier_payoff(paths, K, barrier, barrier_type='up-and-out', option_type='c'):
+    # the barrier is checked on every column including the spot, so a spot beyond it knocks at once
+    if barrier_type not in BARRIER_TYPES:
+        raise ValueError(f"barrier_type must be one of {', '.join(BARRIER_TYPES)}, got {barrier_type!r}")
+    if barrier_type.startswith('up'):
+        hit = paths.max(axis=1) >= barrier
+    else:
+        hit = paths.min(axis=1) <= barrier
+    alive = hit if barrier_type.endswith('-in') else ~hit
+    return np.where(alive, vanilla_payoff(paths, K, option_type), 0.0)
+
+
+def lookback_payoff(paths, K=None, option_type='c', strike='floating'):
+    # floating: the extreme of the path is the strike (S_T - min or max - S_T),
+    # fixed: the extreme is the underlying (max - K or K - min)
+    if strike == 'floating':
+        return paths[:, -1] - paths.min(axis=1) if option_type == 'c' else paths.max(axis=1) - paths[:, -1]
+    if strike == 'fixed':
+        return np.maximum(paths.max(axis=1) - K, 0) if option_type == 'c' else np.maximum(K - paths.min(axis=1), 0)
+    raise ValueError(f"strike must be one of {', '.join(LOOKBACK_STRIKES)}, got {strike!r}")
+
+
+def geometric_asian_price(model, n_steps, option_type='c'):
+    # closed form of the discretely monitored geometric average option: log G is normal with mean m and
+    # variance v over the dates i*dt, i = 1..n_steps
+    N = n_steps
+    dt = model.t / N
+    m = np.log(model.S) + (model.r - 0.5*model.sigma**2)*dt*(N + 1)/2
+    v = model.sigma**2*dt*(N + 1)*(2*N + 1)/(6*N)
+    d_1 = (m - np.log(model.K) + v)/np.sqrt(v)
+    d_2 = d_1 - np.sqrt(v)
+    forward = np.exp(m + v/2)
+    if option_type == 'c':
+        value = forward*norm_backend.cdf(d_1) - model.K*norm_backend.cdf(d_2)
+    else:
+        value = model.K*norm_backend.cdf(-d_2) - forward*norm_backend.cdf(-d_1)
+    return model.discount*value
+
+
+def make_payoff(model, kind, n_steps, option_type='c', barrier=None, barrier_type='up-and-out', strike='fixed'):
+    """(payoff, control) for the exotic kind on the model's strike, both take a block of paths
+
+    control returns (control samples, their expectation), the expectation is undiscounted like the payoffs.
+    """
+    K = model.K
+    growth = 1/model.discount
+    european = model.c_p if option_type == 'c' else model.p_p
+
+    def european_control(paths):
+        return vanilla_payoff(paths, K, option_type), growth*european
+
+    if kind == 'asian':
+        def payoff(paths):
+            return asian_payoff(paths, K, option_type)
+
+        geometric = geometric_asian_price(model, n_steps, option_type)
+
+        def control(paths):
+            return geometric_asian_payoff(paths, K, option_type), growth*geometric
+    elif kind == 'barrier':
+        if barrier is None:
+            raise ValueError("a barrier option needs a barrier level")
+
+        def payoff(paths):
+            return barrier_payoff(paths, K, barrier, barrier_type, option_type)
+        control = european_control
+    elif kind == 'lookback':
+        def payoff(paths):
+            return lookback_payoff(paths, K, option_type, strike)
+        control = european_control
+    else:
+        raise ValueError(f"kind must be one of {', '.join(PAYOFFS)}, got {kind!r}")
+    return payoff, control
+
+
+def simulate(model, payoff, n_paths, n_steps, chunk_size=10000, rng=None, control=None, stop=None):
+    """Price payoff incrementally, yields the RunningStats of the discounted payoff after every chunk of paths
+
+    The paths are risk neutral (drift r) and streamed with gbm_paths_chunks, so memory stays at one chunk
+    whatever n_paths. With a control the control variate coefficient is fitted on the first chunk and kept fixed,
+    so every later chunk is an iid sample of the same adjusted estimator and the merged standard error stays
+    valid. The generator ends after n_paths paths, or early once stop (a threading.Event) is set.
+    """
+    discount = model.discount
+    stats = RunningStats()
+    beta = None
+    for _, paths in model.gbm_paths_chunks(n_paths, n_steps, chunk_size, rng=make_rng(rng)):
+        samples = payoff(paths)
+        if control is not None:
+            x, x_mean = control(paths)
+            if beta is None:
+                beta = control_beta(samples, x)
+            samples = control_variate(samples, x, x_mean, beta)
+        samples *= discount
+        stats.update(samples)
+        yield stats.copy()
+        if stop is not None and stop.is_set():
+            return
+
+
+def price(params, kind, n_paths, n_steps, option_type='c', barrier=None, barrier_type='up-and-out',
+          strike='fixed', use_control=True, chunk_size=10000, rng=None):
+    # final (price, stderr) of a full run for (S, K, sigma, r, T)
+    model = BlackScholesModel(*params)
+    payoff, control = make_payoff(model, kind, n_steps, option_type, barrier, barrier_type, strike)
+    stats = RunningStats()
+    for stats in simulate(model, payoff, n_paths, n_steps, chunk_size, rng, control if use_control else None):
+        pass
+    return stats.mean, stats.stderr
@@ -0,0 +1,167 @@
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+
+import main
+from result_cache import cached, param_key
+
+# Heatmap and P&L chart grids answered from cached surfaces instead of a new meshgrid + BlackScholesModel per
+# redraw.
+#
+# Heatmap: the call price over (S, sigma) only depends on (K, r, t), so one dense surface per (K, r, t) answers
+# every S/sigma range and heatmap size inside it by bicubic interpolation, moving S or sigma no longer costs a
+# full evaluation. Puts follow from put-call parity. A request outside the surface rebuilds it over the union of
+# the old and the requested range (padded, so small moves stay inside). The grid spacing is kept below half the
+# price kink width K*sigma*sqrt(t), which holds the interpolation error well below the 2 decimals the heatmap
+# shows; near-expiry low-vol surfaces that would need more than max_resolution points per axis are evaluated
+# exactly instead.
+#
+# P&L chart: the P&L is the expiry price minus a premium that only depends on sigma, so the premium curve is
+# cached per parameter set and any slider range is pure arithmetic on it.
+
+
+class PriceSurface:
+
+    def __init__(self, K, r, t, s_lo, s_hi, sig_lo, sig_hi, resolution):
+        self.K = K
+        self.r = r
+        self.t = t
+        self.s_lo, self.s_hi = s_lo, s_hi
+        self.sig_lo, self.sig_hi = sig_lo, sig_hi
+        self.s_axis = np.linspace(s_lo, s_hi, resolution)
+        self.sig_axis = np.linspace(sig_lo, sig_hi, resolution)
+        S, sigma = np.meshgrid(self.s_axis, self.sig_axis)
+        self.calls = main.BlackScholesModel(S, K, sigma, r, t).call_price()
+        self.spline = RectBivariateSpline(self.sig_axis, self.s_axis, self.calls)
+        self.discount = np.exp(-r*t)
+
+    def covers(self, s_lo, s_hi, sig_lo, sig_hi):
+        return self.s_lo <= s_lo and s_hi <= self.s_hi and self.sig_lo <= sig_lo and sig_hi <= self.sig_hi
+
+    def evaluate(self, s_vals, sig_vals):
+        # call and put prices on the (sig_vals x s_vals) grid, both axes ascending
+        calls = self.spline(sig_vals, s_vals)
+        forward_intrinsic = s_vals - self.K*self.discount
+        calls = np.maximum(calls, np.maximum(forward_intrinsic, 0))  # keep the no-arbitrage lower bound
+        puts = calls - forward_intrinsic
+        return calls, puts
+
+
+class SurfaceCache:
+    """LRU of call price surfaces keyed on the rounded (K, r, t)"""
+
+    def __init__(self, maxsize=16, resolution=129, max_resolution=1025, padding=0.5):
+        self.maxsize = maxsize
+        self.resolution = resolution
+        self.max_resolution = max_resolution
+        self.padding = padding
+        self._surfaces = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds = 0
+        self.exact = 0
+
+    def _resolution(self, K, t, s_lo, s_hi, sig_lo):
+        spacing = K*sig_lo*math.sqrt(t)/2
+        return max(self.resolution, math.ceil((s_hi - s_lo)/spacing) + 1)
+
+    def _padded(self, lo, hi, floor):
+        pad = self.padding*(hi - lo)
+        return max(lo - pad, floor), hi + pad
+
+    def surface(self, K, r, t, s_lo, s_hi, sig_lo, sig_hi):
+        # a surface covering the requested range, None if it would need more than max_resolution points
+        key = param_key((K, r, t))
+        with self._lock:
+            surface = self._surfaces.get(key)
+            if surface is not None and surface.covers(s_lo, s_hi, sig_lo, sig_hi):
+                self._surfaces.move_to_end(key)
+                self.hits += 1
+                return surface
+        new_s = self._padded(s_lo, s_hi, s_lo/2)
+        new_sig = self._padded(sig_lo, sig_hi, sig_lo/2)
+        if surface is not None:
+            # grow the old surface, unless the inputs jumped so far that the union would be mostly unused
+            union_s = min(new_s[0], surface.s_lo), max(new_s[1], surface.s_hi)
+            union_sig = min(new_sig[0], surface.sig_lo), max(new_sig[1], surface.sig_hi)
+            if union_s[1] - union_s[0] <= 4*(new_s[1] - new_s[0]) and \
+                    union_sig[1] - union_sig[0] <= 4*(new_sig[1] - new_sig[0]):
+                new_s, new_sig = union_s, union_sig
+        resolution = self._resolution(K, t, new_s[0], new_s[1], new_sig[0])
+        if resolution > self.max_resolution:
+            with self._lock:
+                self.exact += 1
+            return None
+        surface = PriceSurface(K, r, t, *new_s, *new_sig, resolution)
+        with self._lock:
+            self.builds += 1
+            self._surfaces[key] = surface
+            self._surfaces.move_to_end(key)
+            while len(self._surfaces) > self.maxsize:
+                self._surfaces.popitem(last=False)
+        return surface
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'builds': self.builds, 'exact': self.exact, 'size': len(self._surfaces)}
+
+    def clear(self):
+        with self._lock:
+            self._surfaces.clear()
+            self.hits = 0
+            self.builds = 0
+            self.exact = 0
+
+
+surface_cache = SurfaceCache()
+
+
+def heatmap_values(params, size=10, min_sig=None, max_sig=None, min_s=None, max_s=None):
+    # same axes and grids as BlackScholesModel.cp_heatmap_val, interpolated from the cached surface
+    S, K, sigma, r, t = params
+    if min_sig is None:
+        min_sig = sigma - 1/2*sigma
+    if max_sig is None:
+        max_sig = sigma + 1/2*sigma
+    if min_s is None:
+        min_s = S - 1/5*S
+    if max_s is None:
+        max_s = S + 1/5*S
+    s_vals = np.linspace(min_s, max_s, size)
+    sig_vals = np.linspace(min_sig, max_sig, size)
+    surface = None
+    if min_sig > 0 and min_s > 0 and t > 0:
+        surface = surface_cache.surface(K, r, t, min_s, max_s, min_sig, max_sig)
+    if surface is None:
+        return main.BlackScholesModel(*params).cp_heatmap_val(size, min_sig, max_sig, min_s, max_s)
+    calls, puts = surface.evaluate(s_vals, sig_vals)
+    return s_vals, sig_vals, calls, puts
+
+
+def _premium_curve(params, size, min_sig, max_sig):
+    S, K, sigma, r, t = params
+    sig_vals = np.linspace(min_sig, max_sig, size)
+    model = main.BlackScholesModel(S, K, sig_vals, r, t)
+    return sig_vals, model.c_p, model.p_p
+
+
+def pnl_values(params, size=10, min_sig=None, max_sig=None, min_mp=None, max_mp=None):
+    # same axes and grids as BlackScholesModel.theo_pnl_chart, only the premium curve is ever evaluated
+    S, K, sigma, r, t = params
+    if min_sig is None:
+        min_sig = sigma - 1/2*sigma
+    if max_sig is None:
+        max_sig = sigma + 1/2*sigma
+    if min_mp is None:
+        min_mp = S - 1/5*S
+    if max_mp is None:
+        max_mp = S + 1/5*S
+    market_prices_at_expiry = np.linspace(min_mp, max_mp, size)
+    sig_vals, calls, puts = cached(lambda: _premium_curve(params, size, min_sig, max_sig),
+                                   'premium_curve', params, size, round(min_sig, 6), round(max_sig, 6))
+    call_pnl = market_prices_at_expiry - (K + calls[:, None])
+    put_pnl = (K - puts[:, None]) - market_prices_at_expiry
+    return market_prices_at_expiry, sig_vals, call_pnl, put_pnl
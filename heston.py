@@ -0,0 +1,252 @@
+from functools import lru_cache
+
+import numpy as np
+
+import term_structure
+from implied_vol import implied_vol as solve_implied_vol
+from main import lazy
+
+# Heston stochastic volatility model priced with the Fourier-cosine (COS) method of Fang & Oosterlee (2008).
+#
+# The expansion is done in the log-return R = ln(S_T/S), so the truncation range [a, b], the frequencies u_k
+# and the characteristic function values phi(u_k) depend only on the model parameters and the expiry, not on
+# the strike. They are computed once per expiry (and cached across instances), a whole strike strip then only
+# needs the cheap closed-form payoff coefficients, so pricing 100 strikes costs about the same as pricing one.
+# Puts are priced by COS (bounded payoff, numerically stable) and calls follow from put-call parity.
+
+
+@lru_cache(maxsize=64)
+def cos_grid(v0, kappa, theta, xi, rho, r, t, n_terms=512, L=24):
+    # cumulants of the log-return (Fang & Oosterlee, Table 11) give the truncation range, c_4 is left out so L is
+    # larger than the paper's 12: with a high vol of variance L=12 truncates the left tail at the 1e-5 level
+    e = np.exp(-kappa * t)
+    c_1 = r * t + (1 - e) * (theta - v0) / (2 * kappa) - 0.5 * theta * t
+    c_2 = 1 / (8 * kappa ** 3) * (
+        xi * t * kappa * e * (v0 - theta) * (8 * kappa * rho - 4 * xi)
+        + kappa * rho * xi * (1 - e) * (16 * theta - 8 * v0)
+        + 2 * theta * kappa * t * (-4 * kappa * rho * xi + xi ** 2 + 4 * kappa ** 2)
+        + xi ** 2 * ((theta - 2 * v0) * e ** 2 + theta * (6 * e - 7) + 2 * v0)
+        + 8 * kappa ** 2 * (v0 - theta) * (1 - e))
+    # c_2 cancels catastrophically for kappa*t -> 0 with v0 != theta, the expected integrated variance
+    # theta*t + (v0 - theta)(1 - e)/kappa (computed with expm1) bounds the width from below
+    mean_variance = theta * t - (v0 - theta) * np.expm1(-kappa * t) / kappa
+    half_width = L * np.sqrt(max(abs(c_2), mean_variance))
+    a, b = c_1 - half_width, c_1 + half_width
+
+    u = np.arange(n_terms) * np.pi / (b - a)
+    # characteristic function in the "little trap" form of Albrecher et al., log phi = C(u) + v0 * D(u)
+    beta = kappa - 1j * rho * xi * u
+    d = np.sqrt(beta ** 2 + xi ** 2 * (1j * u + u ** 2))
+    g = (beta - d) / (beta + d)
+    exp_dt = np.exp(-d * t)
+    D = (beta - d) / xi ** 2 * (1 - exp_dt) / (1 - g * exp_dt)
+    C = 1j * u * r * t + kappa * theta / xi ** 2 * ((beta - d) * t - 2 * np.log((1 - g * exp_dt) / (1 - g)))
+    # A_k = phi(u_k) * exp(-i u_k a), the first term of the cosine series is weighted by 1/2
+    A = np.exp(C + v0 * D - 1j * u * a)
+    A[0] *= 0.5
+    A.setflags(write=False)
+    return a, b, u, A, D
+
+
+MAX_THETA_POINTS = 200  # default theta curve length, every point is a new expiry with its own COS grid
+
+
+class HestonModel:
+    # the prices and greeks of BlackScholesModel (with the breakevens, trade edges, heatmap, P&L chart and theta
+    # curve built on them); S and K may be arrays (e.g. a strike strip), the remaining parameters describe one
+    # expiry. Where BlackScholesModel sweeps sigma, the initial volatility sqrt(v0) is swept. It is not a drop-in
+    # for the pages: the P&L distribution (pnl_*) and Monte Carlo methods are Black-Scholes only, and the pages
+    # build BlackScholesModel directly through result_cache and grid_cache
+    __slots__ = ('S', 'K', 'v0', 'kappa', 'theta', 'xi', 'rho', 'r', 't', 'n_terms',
+                 '_grid', '_coefficients', '_discount', '_p_p', '_c_p', '_put_greeks')
+
+    def __init__(self, S, K, v0, kappa, theta, xi, rho, r, t, n_terms=512):
+        self.S = S # S: Underlying price
+        self.K = K # K: Strike price
+        self.v0 = v0 # v0: initial variance (sigma**2 of BlackScholesModel)
+        self.kappa = kappa # kappa: speed of mean reversion of the variance
+        self.theta = theta # theta: long run variance
+        self.xi = xi # xi: volatility of the variance
+        self.rho = rho # rho: correlation between the price and variance Brownian motions
+        self.r = r # r: interest rate
+        self.t = t # t: Time to expiration (In years)
+        self.n_terms = n_terms # number of cosine terms
+
+    def _replace(self, **changes):
+        # a copy with some parameters changed, e.g. a bumped v0 or expiry
+        params = {name: getattr(self, name) for name in HestonModel.__slots__ if not name.startswith('_')}
+        params.update(changes)
+        return HestonModel(**params)
+
+    @lazy
+    def grid(self):
+        return cos_grid(float(self.v0), float(self.kappa), float(self.theta), float(self.xi), float(self.rho),
+                        float(self.r), float(self.t), int(self.n_terms))
+
+    @lazy
+    def discount(self):
+        return np.exp(-self.r * self.t)
+
+    @lazy
+    def coefficients(self):
+        # put payoff (K - S*e^R)^+ on [a, b], with the kink at c = ln(K/S): V_k = 2/(b-a) * (K*psi_k - S*chi_k)
+        a, b, u, _, _ = self.grid
+        S = np.asarray(self.S, dtype=float)[..., None]
+        K = np.asarray(self.K, dtype=float)[..., None]
+        c = np.clip(np.log(K / S), a, b)
+        angle = u * (c - a)
+        cos_k, sin_k = np.cos(angle), np.sin(angle)
+        exp_c = np.exp(c)
+        chi = (cos_k * exp_c - np.exp(a) + u * sin_k * exp_c) / (1 + u ** 2)
+        psi = np.empty_like(angle)
+        psi[..., 0] = (c - a)[..., 0]
+        psi[..., 1:] = sin_k[..., 1:] / u[1:]
+        scale = 2 / (b - a)
+        return scale * (K * psi - S * chi), scale * chi, scale * cos_k, K, S
+
+    def _expand(self, weights, coefficients):
+        # sum_k Re(weights_k) * coefficients_k over the last axis
+        return coefficients @ weights.real
+
+    @lazy
+    def p_p(self):
+        _, _, _, A, _ = self.grid
+        return self.discount * self._expand(A, self.coefficients[0])
+
+    @lazy
+    def c_p(self):
+        return self.p_p + self.S - self.K * self.discount
+
+    @lazy
+    def put_greeks(self):
+        _, _, u, A, D = self.grid
+        V, chi, cos_k, K, S = self.coefficients
+        S, K = S[..., 0], K[..., 0]
+        delta = -self.discount * self._expand(A, chi)
+        gamma = self.discount * K / S ** 2 * self._expand(A, cos_k)
+        # vega with respect to the initial volatility sqrt(v0), d phi / d v0 = D * phi
+        vega = 2 * np.sqrt(self.v0) * self.discount * self._expand(D * A, V)
+        # phi carries exp(i u r t), the range [a, b] is held fixed
+        rho = -self.t * self.p_p + self.discount * self._expand(1j * u * self.t * A, V)
+        return delta, gamma, vega, rho
+
+    def call_price(self):
+        return self.c_p
+
+    def put_price(self):
+        return self.p_p
+
+    def breakeven_call(self):
+        return self.K + self.c_p
+
+    def breakeven_put(self):
+        return self.K - self.p_p
+
+    def put_call_parity(self):
+        return self.c_p - self.p_p
+
+    def int_value(self):
+        return np.maximum(self.S-self.K, 0)
+
+    def time_value(self):
+        return self.c_p - np.maximum(self.S-self.K, 0)
+
+    def thetas(self, dt=1/365):
+        # central difference in the expiry, each bumped model has its own (cached) integration grid. Close to
+        # expiry theta grows like 1/sqrt(t), the bump is kept small against t to stay accurate there
+        dt = min(dt, self.t / 50)
+        params = (self.S, self.K, self.v0, self.kappa, self.theta, self.xi, self.rho, self.r)
+        later = HestonModel(*params, self.t + dt, self.n_terms)
+        earlier = HestonModel(*params, self.t - dt, self.n_terms)
+        theta_put = -(later.p_p - earlier.p_p) / (2 * dt)
+        theta_call = theta_put - self.r * self.K * self.discount
+        return theta_call, theta_put, theta_call/365, theta_put/365
+
+    def sensitivity_analysis(self, parameter=None):
+        delta_put, gamma, vega, rho_put = self.put_greeks
+        delta_call = delta_put + 1
+        rho_call = rho_put + self.K * self.t * self.discount
+        if parameter == 'd':
+            return delta_call, delta_put
+        elif parameter == 'g':
+            return gamma
+        elif parameter == 'v':
+            return vega
+        elif parameter == 'r':
+            return rho_call, rho_put
+        elas_call = (delta_call*self.S)/self.c_p
+        elas_put = (delta_call*self.S)/self.p_p
+        return [delta_call, delta_put, gamma, vega, rho_call, rho_put, elas_call, elas_put]
+
+    def theo_call_pnl(self, market_price_at_expiry):
+        return market_price_at_expiry - self.breakeven_call()
+
+    def theo_put_pnl(self, market_price_at_expiry):
+        return self.breakeven_put() - market_price_at_expiry
+
+    def call_trade_edge(self, market_maker_quote):
+        return self.c_p - market_maker_quote
+
+    def put_trade_edge(self, market_maker_quote):
+        return market_maker_quote - self.p_p
+
+    def prac_call_pnl(self, market_maker_quote, market_prices_at_expiry):
+        return market_prices_at_expiry - (self.K + market_maker_quote)
+
+    def prac_put_pnl(self, market_maker_quote, market_prices_at_expiry):
+        return (self.K + market_maker_quote) - market_prices_at_expiry
+
+    def implied_vol(self, market_maker_quote, option_type='c'):
+        # the Black-Scholes volatility that reprices the quote, nan if the quote breaks the no-arbitrage bounds
+        return solve_implied_vol(market_maker_quote, self.S, self.K, self.r, self.t, option_type)[0]
+
+    def summary(self, market_price_at_expiry):
+        statline_call = [self.breakeven_call(), self.c_p, market_price_at_expiry - self.breakeven_call()]
+        statline_put = [self.breakeven_put(), self.p_p, self.breakeven_put() - market_price_at_expiry]
+        return statline_call, statline_put
+
+    def _vol_axis(self, size, min_sig, max_sig):
+        vol0 = np.sqrt(self.v0)
+        if min_sig is None:
+            min_sig = vol0 - 1/2*vol0
+        if max_sig is None:
+            max_sig = vol0 + 1/2*vol0
+        return np.linspace(min_sig, max_sig, size)
+
+    def cp_heatmap_val(self, size=10, min_sig=None, max_sig=None, min_s=None, max_s=None):
+        # the axes of BlackScholesModel.cp_heatmap_val, one COS grid per volatility row prices all spots at once
+        if min_s is None:
+            min_s = self.S - 1/5*self.S
+        if max_s is None:
+            max_s = self.S + 1/5*self.S
+        s_vals = np.linspace(min_s, max_s, size)
+        sig_vals = self._vol_axis(size, min_sig, max_sig)
+        calls = np.empty((size, size))
+        puts = np.empty((size, size))
+        for i, sig in enumerate(sig_vals):
+            model = self._replace(S=s_vals, v0=sig**2)
+            calls[i], puts[i] = model.c_p, model.p_p
+        return s_vals, sig_vals, calls, puts
+
+    def theo_pnl_chart(self, size=10, min_sig=None, max_sig=None, min_mp=None, max_mp=None):
+        # the axes of BlackScholesModel.theo_pnl_chart, the breakevens move with the initial volatility
+        if min_mp is None:
+            min_mp = self.S - 1/5*self.S
+        if max_mp is None:
+            max_mp = self.S + 1/5*self.S
+        market_prices_at_expiry = np.linspace(min_mp, max_mp, size)
+        sig_vals = self._vol_axis(size, min_sig, max_sig)
+        models = [self._replace(v0=sig**2) for sig in sig_vals]
+        call_pnl = np.array([model.theo_call_pnl(market_prices_at_expiry) for model in models])
+        put_pnl = np.array([model.theo_put_pnl(market_prices_at_expiry) for model in models])
+        return market_prices_at_expiry, sig_vals, call_pnl, put_pnl
+
+    def theta_decay_graph(self, n=None, spacing='linear'):
+        # the return values of BlackScholesModel.theta_decay_graph, one point per day up to MAX_THETA_POINTS
+        # unless n is given: every expiry on the curve needs its own characteristic-function grid
+        if n is None:
+            n = min(int(self.t*365), MAX_THETA_POINTS)
+        T = term_structure.time_grid(self.t, n, spacing)
+        thetas = np.array([self._replace(t=t).thetas()[:2] for t in T], dtype=float)
+        theta_call, theta_put = thetas[:, 0], thetas[:, 1]
+        return T, theta_call, theta_put, theta_call/365, theta_put/365
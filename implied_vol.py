@@ -0,0 +1,103 @@
+import numpy as np
+
+import norm_backend
+from chain import call_mask
+
+# Vectorized implied volatility. Every quote is mapped (put-call parity) to the out-of-the-money option with the
+# same time value, and Newton-Raphson is run on log(price) with the analytic vega, which is close to linear in
+# sigma even far from the money. The iteration starts from the Corrado-Miller rational guess and is safeguarded
+# by a per-element [lo, hi] bracket: when a Newton step leaves the bracket that element bisects instead.
+#
+# The time value is computed as a difference of prices of the size of S, so it carries an absolute rounding error
+# of a few ulps of S. Deep in- or out-of-the-money quotes whose time value is lost in that error, or where the
+# vega at the solution is so small that this error moves sigma by more than MAX_VOL_ERROR, have no meaningful
+# implied vol: they come back as nan, not converged.
+
+MAX_VOL_ERROR = 1e-6  # the largest sigma uncertainty (from the rounding of the time value) still reported
+ROUNDING_ULPS = 8  # rounding error of the time value, in ulps of max(S, K*exp(-r*t))
+
+
+def _otm_price_vega(S, X, w, sigma, t):
+    # X is the discounted strike K*exp(-r*t), w = +1 prices the call and w = -1 the put
+    sqrt_t = np.sqrt(t)
+    sig_sqrt_t = sigma * sqrt_t
+    d_1 = np.log(S / X) / sig_sqrt_t + 0.5 * sig_sqrt_t
+    price = w * (S * norm_backend.cdf(w * d_1) - X * norm_backend.cdf(w * (d_1 - sig_sqrt_t)))
+    vega = S * sqrt_t * norm_backend.pdf(d_1)
+    return price, vega
+
+
+def initial_guess(call, S, X, t):
+    # Corrado & Miller (1996) closed-form approximation, falls back to the Manaster-Koehler point
+    # sqrt(2|ln(S/X)|/t) when the square root turns negative (deep ITM/OTM quotes)
+    a = call - (S - X) / 2
+    root = np.sqrt(np.maximum(a * a - (S - X) ** 2 / np.pi, 0))
+    sigma = np.sqrt(2 * np.pi) / (S + X) * (a + root) / np.sqrt(t)
+    fallback = np.sqrt(2 * np.abs(np.log(S / X)) / t)
+    sigma = np.where(np.isfinite(sigma) & (sigma > 1e-4), sigma, fallback)
+    return np.clip(sigma, 1e-4, 5.0)
+
+
+def implied_vol(price, S, K, r, t, option_type='c', tol=1e-10, max_iter=20, vol_tol=1e-10):
+    # returns (sigma, converged), both arrays broadcast to the shape of the inputs
+    # an element converges once the relative error of the out-of-the-money price is below tol or the Newton step
+    # is below vol_tol (small prices hit the rounding floor of the log price before tol). Quotes outside the
+    # no-arbitrage bounds or without a resolvable time value (see MAX_VOL_ERROR) can't be inverted: their sigma
+    # is nan and converged is False
+    price, S, K, r, t = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in (price, S, K, r, t)))
+    shape = price.shape
+    price, S, K, r, t = (a.ravel() for a in (price, S, K, r, t))
+    is_call = call_mask(np.broadcast_to(option_type, shape).ravel(), price.size)
+
+    X = K * np.exp(-r * t)
+    call = np.where(is_call, price, price + S - X)
+    # time value = price of the out-of-the-money option, w picks which one that is
+    otm = call - np.maximum(S - X, 0)
+    noise = ROUNDING_ULPS * np.spacing(np.maximum(S, X))
+    valid = (otm > noise) & (call < S) & (t > 0)
+
+    sigma = np.full(price.size, np.nan)
+    converged = np.zeros(price.size, dtype=bool)
+
+    idx = np.flatnonzero(valid)
+    target, s, x, tt, eps = otm[idx], S[idx], X[idx], t[idx], noise[idx]
+    w = np.where(s > x, -1.0, 1.0)
+    log_target = np.log(target)
+    sig = initial_guess(call[idx], s, x, tt)
+    lo = np.zeros_like(sig)
+    hi = 10.0 / np.sqrt(np.minimum(tt, 1.0))
+
+    for _ in range(max_iter):
+        if idx.size == 0:
+            break
+        model_price, vega = _otm_price_vega(s, x, w, sig, tt)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            diff = np.log(model_price) - log_target
+
+            # tighten the bracket, the option price is increasing in sigma
+            above = diff > 0
+            hi = np.where(above, sig, hi)
+            lo = np.where(above, lo, sig)
+            step = diff * model_price / vega
+            newton = sig - step
+            in_bracket = (newton > lo) & (newton < hi)
+
+            price_done = np.abs(diff) < tol
+            # a Newton step within vol_tol, or a bracket narrower than that around sig
+            step_done = (in_bracket & (np.abs(step) < vol_tol)) | (hi - lo < vol_tol)
+            done = price_done | step_done
+            # the sigma uncertainty the rounding of the time value leaves at the solution
+            resolvable = eps / vega <= MAX_VOL_ERROR
+        solved = done & resolvable
+        sigma[idx[solved]] = np.where(price_done | ~in_bracket, sig, newton)[solved]
+        converged[idx[solved]] = True
+        # done but unresolvable elements stay nan and not converged
+        sig = np.where(in_bracket, newton, 0.5 * (lo + hi))
+
+        keep = ~done
+        idx, target, log_target, s, x, w, tt, sig, lo, hi, eps = (
+            a[keep] for a in (idx, target, log_target, s, x, w, tt, sig, lo, hi, eps))
+
+    # elements that ran out of iterations keep their last estimate but are flagged as not converged
+    sigma[idx] = sig
+    return sigma.reshape(shape), converged.reshape(shape)
@@ -1,8 +1,54 @@
+import time
+
 import numpy as np
-from scipy.stats import norm
+from scipy.special import ndtri
+
+import mc_stats
+import norm_backend
+import term_structure
+import variance_reduction
+from implied_vol import implied_vol as solve_implied_vol
 
 #np.set_printoptions(legacy = '1.25')
+
+# gbm_paths draws its normals through a scratch buffer of about this many floats
+NORMALS_BLOCK = 1 << 16
+
+
+class lazy:
+    # cached property for classes with __slots__: the value is computed on first access and stored in the
+    # slot named '_' + the property name, so a model only pays for the intermediates it actually uses
+    def __init__(self, func):
+        self.func = func
+        self.slot = '_' + func.__name__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        try:
+            return getattr(obj, self.slot)
+        except AttributeError:
+            value = self.func(obj)
+            setattr(obj, self.slot, value)
+            return value
+
+
+def make_rng(rng=None):
+    # the Generator used by the stochastic methods: a Generator is used as is, anything else (None, an int seed,
+    # a SeedSequence) seeds a new PCG64DXSM generator, None with fresh OS entropy. Pass the same Generator to
+    # several calls to continue one stream, pass a seed to reproduce a run
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if isinstance(rng, np.random.BitGenerator):
+        return np.random.Generator(rng)
+    return np.random.Generator(np.random.PCG64DXSM(rng))
+
+
 class BlackScholesModel:
+    # the inputs are treated as read-only after construction, the cached intermediates are not invalidated
+    __slots__ = ('S', 'K', 'sigma', 'r', 't',
+                 '_sqrt_t', '_discount', '_d_1', '_d_2', '_cdf_d1', '_cdf_d2', '_cdf_neg_d1', '_cdf_neg_d2',
+                 '_pdf_d1', '_c_p', '_p_p')
 
     def __init__(self, S, K, sigma, r, t):
         self.S = S # S: Underlying price (The current price of a stock)
@@ -10,12 +56,51 @@ class BlackScholesModel:
         self.sigma = sigma # \sigma: volatility (standard deviation of the stock)
         self.r = r # r: interest rate
         self.t = t # t: Time to expiration (In years)
+        # nothing is priced here, d_1, d_2, c_p, p_p and the cdf/pdf values are computed lazily (see lazy)
+
+    @lazy
+    def sqrt_t(self):
+        return np.sqrt(self.t)
+
+    @lazy
+    def discount(self):
+        return np.exp(-self.r * self.t)
+
+    @lazy
+    def d_1(self):
+        return (np.log(self.S/self.K)+(self.r+1/2*self.sigma**2)*self.t)/(self.sigma*self.sqrt_t)
 
-        self.d_1 = (np.log(self.S/self.K)+(self.r+1/2*self.sigma**2)*self.t)/(self.sigma*np.sqrt(self.t))
-        self.d_2 = self.d_1 - (self.sigma*np.sqrt(self.t))
+    @lazy
+    def d_2(self):
+        return self.d_1 - (self.sigma*self.sqrt_t)
 
-        self.c_p = self.S * norm.cdf(self.d_1) - self.K * np.exp(-self.r * self.t) * norm.cdf(self.d_2)
-        self.p_p = self.K*np.exp(-self.r*self.t)*norm.cdf(-self.d_2)-self.S*norm.cdf(-self.d_1)
+    @lazy
+    def cdf_d1(self):
+        return norm_backend.cdf(self.d_1)
+
+    @lazy
+    def cdf_d2(self):
+        return norm_backend.cdf(self.d_2)
+
+    @lazy
+    def cdf_neg_d1(self):
+        return norm_backend.cdf(-self.d_1)
+
+    @lazy
+    def cdf_neg_d2(self):
+        return norm_backend.cdf(-self.d_2)
+
+    @lazy
+    def pdf_d1(self):
+        return norm_backend.pdf(self.d_1)
+
+    @lazy
+    def c_p(self):
+        return self.S * self.cdf_d1 - self.K * self.discount * self.cdf_d2
+
+    @lazy
+    def p_p(self):
+        return self.K*self.discount*self.cdf_neg_d2-self.S*self.cdf_neg_d1
 
     def call_price(self):
         return self.c_p
@@ -38,25 +123,60 @@ class BlackScholesModel:
     def time_value(self):
         return self.c_p - np.maximum(self.S-self.K, 0)
 
-    def gbm_path(self, n_steps, mu=None):
-        # if nu is not given, use the theoretical value of r
+    def gbm_path(self, n_steps, mu=None, rng=None):
+        # this is the associated geometric brownian motion path of the price given the model parameters
+        # mu stands for the drift coefficient, n is number of time steps
+        # rng is a numpy Generator or a seed for every stochastic method (see make_rng)
+        time_values, price_path = self.gbm_paths(1, n_steps, mu, rng=rng)
+        return time_values, price_path[0]
+
+    def gbm_paths(self, n_paths, n_steps, mu=None, out=None, rng=None):
+        # if mu is not given, use the theoretical value of r
         if mu is None:
             mu = self.r
-        # this is the associated geometric brownian motion path of the price given the model parameters
-        # mu stands for the drift coefficient, n is number of time steps, dt is the time step
+        rng = make_rng(rng)
+        # every row is one path, column 0 is S at time 0, pass out= to reuse the buffer between runs
+        if out is None:
+            out = np.empty((n_paths, n_steps + 1))
+        elif out.shape != (n_paths, n_steps + 1):
+            raise ValueError(f"out must have shape {(n_paths, n_steps + 1)}, got {out.shape}")
         dt = self.t / n_steps
         time_values = np.linspace(0, self.t, n_steps + 1)
 
-        # Brownian motion increments and compute cumulative sum
-        dW = np.random.normal(0, np.sqrt(dt), size=n_steps)
-        W = np.cumsum(dW)  # Cumulative Brownian motion
-        W = np.insert(W, 0, 0)  # Start at W(0) = 0
+        # Brownian motion increments are written into the buffer and summed in place,
+        # W(0) = 0 is the first column, so no np.insert copy is needed
+        # exactly n_paths x n_steps normals are drawn in row order, a block of rows at a time through a small
+        # scratch buffer, so a seed gives the same paths whatever the layout of out
+        rows = max(NORMALS_BLOCK // max(n_steps, 1), 1)
+        scratch = np.empty((min(rows, n_paths), n_steps))
+        for start in range(0, n_paths, rows):
+            block = scratch[:min(rows, n_paths - start)]
+            rng.standard_normal(out=block)
+            out[start:start + len(block), 1:] = block
+        out[:, 0] = 0
+        out[:, 1:] *= np.sqrt(dt)
+        np.cumsum(out[:, 1:], axis=1, out=out[:, 1:])
 
         # We use exact solution to the SDE(My first approach was Euler-Maruyama)
-        exponent = (mu - 0.5 * self.sigma ** 2) * time_values + self.sigma * W
-        price_path = self.S * np.exp(exponent)
-
-        return time_values, price_path
+        out *= self.sigma
+        out += (mu - 0.5 * self.sigma ** 2) * time_values
+        np.exp(out, out=out)
+        out *= self.S
+        return time_values, out
+
+    def gbm_paths_chunks(self, n_paths, n_steps, chunk_size=10000, mu=None, out=None, rng=None):
+        # streaming version of gbm_paths, yields (time_values, paths) blocks of at most chunk_size paths
+        # the same buffer is reused for every block, so memory stays at chunk_size x (n_steps + 1) floats
+        # callers must consume (or copy) a block before asking for the next one
+        # all blocks draw from one generator, so a seed gives the same paths for any chunk_size
+        rng = make_rng(rng)
+        if out is None:
+            out = np.empty((min(chunk_size, n_paths), n_steps + 1))
+        done = 0
+        while done < n_paths:
+            size = min(out.shape[0], n_paths - done)
+            yield self.gbm_paths(size, n_steps, mu, out=out[:size], rng=rng)
+            done += size
 
     def cp_heatmap_val(self, size=10, min_sig=None, max_sig=None, min_s=None, max_s=None):
         if min_sig is None:
@@ -77,9 +197,9 @@ class BlackScholesModel:
         return s_vals, sig_vals, calls, puts
 
     def thetas(self):
-        term_one = -((self.S*self.sigma*norm.pdf(self.d_1))/(2*np.sqrt(self.t)))
-        theta_call = term_one-self.r*self.K*np.exp(-self.r*self.t)*norm.cdf(self.d_2)
-        theta_put = term_one+self.r*self.K*np.exp(-self.r*self.t)*norm.cdf(-self.d_2)
+        term_one = -((self.S*self.sigma*self.pdf_d1)/(2*self.sqrt_t))
+        theta_call = term_one-self.r*self.K*self.discount*self.cdf_d2
+        theta_put = term_one+self.r*self.K*self.discount*self.cdf_neg_d2
         # Theta peaks for at-the-money (ATM) options. Deep ITM options behave like the stock (low theta).
         # Deep OTM options have little value left to lose.
         theta_c_daily = theta_call/365
@@ -87,57 +207,52 @@ class BlackScholesModel:
         return theta_call, theta_put, theta_c_daily, theta_p_daily
 
     def sensitivity_analysis(self, parameter=None):
+        # only the greeks that are asked for are computed, the cdf/pdf values are shared through the cache
+        if parameter == 'd':
+            return self.cdf_d1, self.cdf_d1 - 1
+        elif parameter == 'g':
+            return self.pdf_d1/(self.S*self.sigma*self.sqrt_t)
+        elif parameter == 'v':
+            return self.S*self.sqrt_t*self.pdf_d1
+        elif parameter == 'r':
+            return self.K*self.t*self.discount*self.cdf_d2, -self.K*self.t*self.discount*self.cdf_neg_d2
+
         # for every $1 increase in S, call price goes up this amount
-        delta_call = norm.cdf(self.d_1)
-        delta_put = norm.cdf(self.d_1) - 1
+        delta_call = self.cdf_d1
+        delta_put = self.cdf_d1 - 1
         # Sensitivity of Delta to Stock Price(If S moves by 1$, delta moves by this amount)
-        gamma = (norm.pdf(self.d_1))/(self.S*self.sigma*np.sqrt(self.t))
+        gamma = self.pdf_d1/(self.S*self.sigma*self.sqrt_t)
         # Sensitivity to Volatility (for 1% increase in sigma, option price moves this amount)
-        vega = self.S*np.sqrt(self.t)*norm.pdf(self.d_1)
+        vega = self.S*self.sqrt_t*self.pdf_d1
         # Sensitivity to Interest Rates(amount of price change to 1% change in r)
-        rho_call = self.K*self.t*np.exp(-self.r*self.t)*norm.cdf(self.d_2)
-        rho_put = -self.K*self.t*np.exp(-self.r*self.t)*norm.cdf(-self.d_2)
+        rho_call = self.K*self.t*self.discount*self.cdf_d2
+        rho_put = -self.K*self.t*self.discount*self.cdf_neg_d2
         # Elasticity
         elas_call = (delta_call*self.S)/self.c_p
         elas_put = (delta_call*self.S)/self.p_p
 
-        if parameter is None:
-            an = [delta_call, delta_put, gamma, vega, rho_call, rho_put, elas_call, elas_put]
-            return an
-        elif parameter == 'd':
-            return delta_call, delta_put
-        elif parameter == 'g':
-            return gamma
-        elif parameter == 'v':
-            return vega
-        elif parameter == 'r':
-            return rho_call, rho_put
-        else:
-            an_o = [delta_call, delta_put, gamma, vega, rho_call, rho_put, elas_call, elas_put]
-            return an_o
+        an = [delta_call, delta_put, gamma, vega, rho_call, rho_put, elas_call, elas_put]
+        return an
 
     def summary(self, market_price_at_expiry): # maybe unnecessary
         statline_call = []
         statline_put = []
-        model = BlackScholesModel(self.S, self.K, self.sigma, self.r, self.t)
-        statline_call.append(model.breakeven_call()) # stock must rise above this to profit
-        statline_call.append(model.c_p) # max loss of call option in currency
-        profit_call = market_price_at_expiry - model.breakeven_call()
+        statline_call.append(self.breakeven_call()) # stock must rise above this to profit
+        statline_call.append(self.c_p) # max loss of call option in currency
+        profit_call = market_price_at_expiry - self.breakeven_call()
         statline_call.append(profit_call)
-        statline_put.append(model.breakeven_put())  # stock must fall below this to profit(Max gain)
-        statline_put.append(model.p_p)  # max loss of put option in currency
-        profit_put = model.breakeven_put() - market_price_at_expiry
+        statline_put.append(self.breakeven_put())  # stock must fall below this to profit(Max gain)
+        statline_put.append(self.p_p)  # max loss of put option in currency
+        profit_put = self.breakeven_put() - market_price_at_expiry
         statline_put.append(profit_put)
         return statline_call, statline_put
 
     def theo_call_pnl(self, market_price_at_expiry):
-        model = BlackScholesModel(self.S, self.K, self.sigma, self.r, self.t)
-        pnl = market_price_at_expiry - model.breakeven_call()
+        pnl = market_price_at_expiry - self.breakeven_call()
         return pnl
 
     def theo_put_pnl(self, market_price_at_expiry):
-        model = BlackScholesModel(self.S, self.K, self.sigma, self.r, self.t)
-        pnl = model.breakeven_put() - market_price_at_expiry
+        pnl = self.breakeven_put() - market_price_at_expiry
         return pnl
 
     def theo_pnl_chart(self, size=10, min_sig=None, max_sig=None, min_mp=None, max_mp=None):
@@ -159,9 +274,131 @@ class BlackScholesModel:
         return market_prices_at_expiry, sig_vals, call_pnl, put_pnl
         # Remember we don't actually buy the option if the pnl is negative but this is not highlighted in model.
 
+    # Analytic P&L distribution at expiry of num_contract options bought at premium (the model price if None),
+    # the exact counterpart of c_pnl_edge_simul: S_T is lognormal, ln S_T ~ N(m, s^2) with m = ln S +
+    # (mu - sigma^2/2) t and s = sigma sqrt(t) under the drift mu (r if None). The P&L has an atom at the max loss
+    # -premium (the option expires worthless) and a continuous part above it. Like theo_call_pnl the premium is
+    # not financed, and every method works on array inputs like the prices do.
+
+    def _terminal_log(self, mu):
+        if mu is None:
+            mu = self.r
+        return np.log(self.S) + (mu - 0.5*self.sigma**2)*self.t, self.sigma*self.sqrt_t
+
+    def _premium(self, premium, option_type):
+        if premium is None:
+            return self.c_p if option_type == 'c' else self.p_p
+        return premium
+
+    def pnl_prob_profit(self, premium=None, option_type='c', mu=None):
+        # P(P&L > 0): S_T above K + premium for a call, below K - premium for a put
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        if option_type == 'c':
+            return norm_backend.cdf((m - np.log(self.K + premium))/s)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # a put bought at K or more can not profit
+            return np.where(self.K > premium, norm_backend.cdf((np.log(np.maximum(self.K - premium, 0)) - m)/s), 0.0)
+
+    def pnl_expected(self, premium=None, num_contract=1, option_type='c', mu=None):
+        # E[payoff] - premium with E[payoff] the undiscounted price at rate mu
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        d_2 = (m - np.log(self.K))/s
+        forward = np.exp(m + 0.5*s**2)
+        if option_type == 'c':
+            payoff = forward*norm_backend.cdf(d_2 + s) - self.K*norm_backend.cdf(d_2)
+        else:
+            payoff = self.K*norm_backend.cdf(-d_2) - forward*norm_backend.cdf(-d_2 - s)
+        return num_contract*(payoff - premium)
+
+    def pnl_std(self, premium=None, num_contract=1, option_type='c', mu=None):
+        # the premium only shifts the P&L, the std is that of the payoff
+        m, s = self._terminal_log(mu)
+        d_2 = (m - np.log(self.K))/s
+        sign = 1 if option_type == 'c' else -1
+        # E[S 1{S>K}] and E[S^2 1{S>K}] (1{S<K} for a put) from the lognormal moments
+        first = np.exp(m + 0.5*s**2)*norm_backend.cdf(sign*(d_2 + s))
+        second = np.exp(2*m + 2*s**2)*norm_backend.cdf(sign*(d_2 + 2*s))
+        in_money = norm_backend.cdf(sign*d_2)
+        mean = sign*(first - self.K*in_money)
+        square = second - 2*self.K*first + self.K**2*in_money
+        return num_contract*np.sqrt(np.maximum(square - mean**2, 0))
+
+    def pnl_quantile(self, q, premium=None, num_contract=1, option_type='c', mu=None):
+        # the P&L below which a fraction q of outcomes falls, -premium for every q within the atom
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        q = np.asarray(q, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if option_type == 'c':
+                payoff = np.maximum(np.exp(m + s*ndtri(q)) - self.K, 0)
+            else:
+                payoff = np.maximum(self.K - np.exp(m + s*ndtri(1 - q)), 0)
+        return num_contract*(payoff - premium)
+
+    def pnl_cdf(self, x, premium=None, num_contract=1, option_type='c', mu=None):
+        # P(P&L <= x), it jumps by the atom at x = -premium
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        payoff = np.asarray(x, dtype=float)/num_contract + premium
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if option_type == 'c':
+                cdf = norm_backend.cdf((np.log(self.K + payoff) - m)/s)
+            else:
+                cdf = 1 - norm_backend.cdf((np.log(np.maximum(self.K - payoff, 0)) - m)/s)
+        return np.where(payoff < 0, 0.0, cdf)
+
+    def pnl_pdf(self, x, premium=None, num_contract=1, option_type='c', mu=None):
+        # density of the continuous part of the P&L at x, the atom at -premium is pnl_cdf(-premium)
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        payoff = np.asarray(x, dtype=float)/num_contract + premium
+        S_T = self.K + payoff if option_type == 'c' else self.K - payoff
+        with np.errstate(divide='ignore', invalid='ignore'):
+            density = norm_backend.pdf((np.log(S_T) - m)/s)/(S_T*s)
+        return np.where((payoff > 0) & (S_T > 0), density, 0.0)/num_contract
+
+    def pnl_distribution(self, premium=None, num_contract=1, option_type='c', mu=None,
+                         quantiles=(0.05, 0.25, 0.5, 0.75, 0.95), size=200, min_mp=None, max_mp=None):
+        # everything the P&L views need in one dict: the summary numbers and, on size expiry prices between
+        # min_mp and max_mp (S -/+ 4 standard deviations of S_T by default), the P&L with its density and cdf
+        premium = self._premium(premium, option_type)
+        m, s = self._terminal_log(mu)
+        if min_mp is None:
+            min_mp = np.exp(m - 4*s)
+        if max_mp is None:
+            max_mp = np.exp(m + 4*s)
+        expiry_prices = np.linspace(min_mp, max_mp, size)
+        if option_type == 'c':
+            pnl = num_contract*(np.maximum(expiry_prices - self.K, 0) - premium)
+            max_gain = np.inf
+        else:
+            pnl = num_contract*(np.maximum(self.K - expiry_prices, 0) - premium)
+            max_gain = num_contract*(self.K - premium)
+        args = (premium, num_contract, option_type, mu)
+        return {
+            'premium': premium,
+            'prob_profit': self.pnl_prob_profit(premium, option_type, mu),
+            'expected': self.pnl_expected(*args),
+            'std': self.pnl_std(*args),
+            'max_loss': -num_contract*premium,
+            'max_gain': max_gain,
+            'prob_max_loss': self.pnl_cdf(-num_contract*premium, *args),
+            'quantiles': dict(zip(quantiles, self.pnl_quantile(quantiles, *args))),
+            'expiry_prices': expiry_prices,
+            'pnl': pnl,
+            'density': self.pnl_pdf(pnl, *args),
+            'cdf': self.pnl_cdf(pnl, *args),
+        }
+
     def call_trade_edge(self, market_maker_quote):
         return self.c_p - market_maker_quote # the mispricing
 
+    def implied_vol(self, market_maker_quote, option_type='c'):
+        # the volatility that makes the model price equal to the quote, nan if the quote breaks the no-arbitrage bounds
+        return solve_implied_vol(market_maker_quote, self.S, self.K, self.r, self.t, option_type)[0]
+
     def prac_call_pnl(self, market_maker_quote, market_prices_at_expiry):
         return market_prices_at_expiry - (self.K + market_maker_quote)
 
@@ -171,28 +408,185 @@ class BlackScholesModel:
     def prac_put_pnl(self, market_maker_quote, market_prices_at_expiry):
         return (self.K + market_maker_quote) - market_prices_at_expiry
 
-    def theta_decay_graph(self):
-        T = np.linspace(1/365, self.t, int(self.t*365))
-        d_1 = (np.log(self.S/self.K)+(self.r+1/2*self.sigma**2)*T)/(self.sigma*np.sqrt(T))
-        d_2 = d_1 - (self.sigma*np.sqrt(T))
-        term_one = -((self.S * self.sigma * norm.pdf(d_1)) / (2 * np.sqrt(T)))
-        theta_call = term_one - self.r * self.K * np.exp(-self.r * T) * norm.cdf(d_2)
-        theta_put = term_one + self.r * self.K * np.exp(-self.r * T) * norm.cdf(-d_2)
-
+    def term_structure(self, T=None, n=200, spacing='linear', greeks=('theta',), t_min=None, tol=1e-3):
+        # the greeks of this option with the time to expiry swept over T (a caller-given grid, otherwise n points
+        # up to self.t spaced 'linear', 'log' or 'adaptive', see term_structure.py), all from the closed forms
+        # evaluated on the whole grid at once. greeks is any of 'theta', 'delta', 'gamma', 'vega', 'rho' or 'all'
+        if greeks == 'all':
+            greeks = ('theta', 'delta', 'gamma', 'vega', 'rho')
+        elif isinstance(greeks, str):
+            greeks = (greeks,)
+
+        def curves(T):
+            model = BlackScholesModel(self.S, self.K, self.sigma, self.r, T)
+            out = {}
+            for greek in greeks:
+                if greek == 'theta':
+                    out['theta_call'], out['theta_put'] = model.thetas()[:2]
+                elif greek in ('delta', 'rho'):
+                    out[greek + '_call'], out[greek + '_put'] = model.sensitivity_analysis(greek[0])
+                elif greek in ('gamma', 'vega'):
+                    out[greek] = model.sensitivity_analysis(greek[0]) * np.ones_like(T)
+                else:
+                    raise ValueError(f"unknown greek {greek!r}")
+            return out
+
+        if T is None:
+            if spacing == 'adaptive':
+                T = term_structure.adaptive_time_grid(lambda T: np.array(list(curves(T).values())), self.t, n,
+                                                      t_min, tol)
+            else:
+                T = term_structure.time_grid(self.t, n, spacing, t_min)
+        T = np.asarray(T, dtype=float)
+        return dict(curves(T), T=T)
+
+    def theta_decay_graph(self, n=None, spacing='linear'):
+        # one point per day up to expiry unless n is given, at least two points even for options expiring within
+        # a day or two
+        if n is None:
+            n = int(self.t*365)
+        ts = self.term_structure(n=n, spacing=spacing)
+        T, theta_call, theta_put = ts['T'], ts['theta_call'], ts['theta_put']
         return T, theta_call, theta_put, theta_call/365, theta_put/365
 
-    def c_pnl_edge_simul(self, premium, num_contract, number_trade, mu = None):
+    def terminal_from_normals(self, z, mu=None):
+        # S_T for standard normal draws z of any shape, z is overwritten with the result
+        if mu is None:
+            mu = self.r
+        z *= self.sigma * np.sqrt(self.t)
+        z += (mu - 0.5 * self.sigma ** 2) * self.t
+        np.exp(z, out=z)
+        z *= self.S
+        return z
+
+    def terminal_prices(self, n_paths, mu=None, rng=None):
+        # if mu is not given, use the theoretical value of r
+        # only S_T is needed, so we sample the exact lognormal terminal distribution of the GBM in one pass
+        # instead of building a full path for every draw
+        return self.terminal_from_normals(make_rng(rng).standard_normal(n_paths), mu)
+
+    def c_pnl_edge_estimate(self, premium, num_contract, number_trade, mu=None, rng=None, method='plain',
+                            replicates=16):
+        # mean P&L of number_trade simulated trades and its standard error, method is one of
+        # variance_reduction.METHODS: 'plain', 'antithetic', 'control' (the call payoff with its closed-form
+        # expectation e^(mu t) * c_p at rate mu as the control), 'moment' or 'sobol'
+        samples, mean, error = self._pnl_samples(premium, num_contract, number_trade, mu, rng, method, replicates)
+        return mean, error
+
+    def c_pnl_edge_progressive(self, premium, num_contract, tol=None, time_budget=None, max_trades=None, mu=None,
+                               rng=None, method='plain', first_batch=1000, growth=2.0, max_batch=1_000_000):
+        # anytime version of c_pnl_edge_estimate: the trades are simulated in batches growing by `growth` from
+        # first_batch up to max_batch and (mean, stderr, n) is yielded after every batch, so the first answer
+        # comes after a few milliseconds and keeps refining. The running mean and variance are merged batch by
+        # batch (Welford/Chan update, see mc_stats.RunningStats), no sample is kept. The run ends once
+        # stderr <= tol, time_budget seconds have passed or max_trades trades were simulated, whichever comes
+        # first; with none of them it refines until the caller stops iterating. Near the end the next batch is
+        # cut to what tol (from the current variance) and the time left (from the current rate) still need.
+        # method is one of variance_reduction.METHODS except 'sobol', whose samples within a batch are not iid.
+        # n, max_trades and the batches count trades: with 'antithetic' a sample is a pair of trades, every batch
+        # is a whole number of pairs and an odd max_trades stops one trade short
+        if method == 'sobol':
+            raise ValueError("method='sobol' has no per-sample standard error, use c_pnl_edge_estimate")
+        per_sample = 2 if method == 'antithetic' else 1
+        if max_trades is not None:
+            max_trades -= max_trades % per_sample
+            if max_trades < per_sample:
+                raise ValueError(f"max_trades must be at least {per_sample} for method={method!r}")
+        rng = make_rng(rng)
+        stats = mc_stats.RunningStats()
+        trades = 0
+        started = time.perf_counter()
+        batch = first_batch
+        while True:
+            if max_trades is not None:
+                batch = min(batch, max_trades - trades)
+            batch = max(batch - batch % per_sample, per_sample)
+            samples = self._pnl_samples(premium, num_contract, batch, mu, rng, method)[0]
+            stats.update(samples)
+            trades += batch
+            yield stats.mean, stats.stderr, trades
+            elapsed = time.perf_counter() - started
+            if ((tol is not None and stats.stderr <= tol)
+                    or (time_budget is not None and elapsed >= time_budget)
+                    or (max_trades is not None and trades >= max_trades)):
+                return
+            batch = min(int(batch*growth), max_batch)
+            if tol is not None and stats.n > 1:
+                # stderr ~ std/sqrt(n) over the samples: trades still missing to reach tol, plus a 10% margin
+                batch = min(batch, max(int(1.1*per_sample*(stats.variance/tol**2 - stats.n)), first_batch))
+            if time_budget is not None:
+                rate = trades/max(elapsed, 1e-9)
+                batch = min(batch, max(int(rate*(time_budget - elapsed)), first_batch))
+
+    def c_pnl_edge_stream(self, premium, num_contract, number_trade, mu=None, rng=None, method='plain',
+                          batch_size=1_000_000, keep_trades=False, max_points=1000, sketch_size=2048):
+        # c_pnl_edge_simul for stress runs of any number_trade: the trades are simulated batch_size at a time
+        # and folded into a mc_stats.PnLAccumulator (mean, variance, quantiles, max drawdown and a downsampled
+        # equity curve), so memory is bounded by the batch and the per-trade P&Ls are only kept with keep_trades.
+        # The accumulator describes the distribution and path of the trades, so only methods whose draws look like
+        # independent trades fit: 'plain' and 'moment'. 'antithetic' pairs would smooth the curve and understate
+        # the drawdown, 'control' only adjusts the mean and 'sobol' has no per-trade order; their estimates come
+        # from c_pnl_edge_estimate
+        if method not in ('plain', 'moment'):
+            raise ValueError(f"the stream reports independent trades, method must be 'plain' or 'moment', got "
+                             f"{method!r} (c_pnl_edge_estimate gives the variance-reduced estimate)")
+        rng = make_rng(rng)
+        # the quantile sketch draws from its own child stream, so the trades of a seed don't depend on
+        # batch_size or sketch_size
+        accumulator = mc_stats.PnLAccumulator(max_points, sketch_size, keep_trades, rng.spawn(1)[0])
+        done = 0
+        while done < number_trade:
+            batch = min(batch_size, number_trade - done)
+            accumulator.update(self._pnl_trades(premium, num_contract, batch, mu, rng, method)[0])
+            done += batch
+        return accumulator
+
+    def _pnl_samples(self, premium, num_contract, number_trade, mu, rng, method, replicates=16):
+        # the estimator samples of variance_reduction.estimate, e.g. number_trade/2 pair averages for 'antithetic'
+        payoff, control = self._pnl_payoff(premium, num_contract, mu)
+        return variance_reduction.estimate(payoff, number_trade, make_rng(rng), method, control, replicates)
+
+    def _pnl_trades(self, premium, num_contract, number_trade, mu, rng, method, replicates=16):
+        # exactly number_trade per-trade P&Ls and their mean, see variance_reduction.samples
+        payoff, control = self._pnl_payoff(premium, num_contract, mu)
+        return variance_reduction.samples(payoff, number_trade, make_rng(rng), method, control, replicates)
+
+    def _pnl_payoff(self, premium, num_contract, mu):
+        # (payoff, control) of one call trade as functions of the normals, the control is the call payoff with
+        # its closed-form expectation e^(mu t) * c_p at rate mu
+        if mu is None:
+            mu = self.r
+
+        def payoff(z):
+            pnl = self.terminal_from_normals(np.array(z, dtype=float), mu)
+            pnl -= self.K
+            np.maximum(pnl, 0, out=pnl)
+            pnl -= premium
+            pnl *= num_contract
+            return pnl
+
+        def control(z):
+            call = np.maximum(self.terminal_from_normals(np.array(z, dtype=float), mu) - self.K, 0)
+            return call, np.exp(mu*self.t) * BlackScholesModel(self.S, self.K, self.sigma, mu, self.t).c_p
+
+        return payoff, control
+
+    def c_pnl_edge_simul(self, premium, num_contract, number_trade, mu = None, rng=None, method='plain'):
         # use premium or market maker quote, number of contracts bought minimises the trading fees
-        total_pnls = []
+        # with a variance reduction method total_pnls still holds the raw P&L of every trade, drawn with that
+        # method (both legs of every antithetic pair, ...), and mean is the method's estimate: for 'control' the
+        # control-adjusted mean of those trades. The estimate with its standard error is c_pnl_edge_estimate
+        if method != 'plain':
+            total_pnls, mean = self._pnl_trades(premium, num_contract, number_trade, mu, rng, method)
+            return total_pnls, mean, np.cumsum(total_pnls)
         if mu is None:
             mu = self.r
-        model = BlackScholesModel(self.S, self.K, self.sigma, self.r, self.t)
-        for _ in range(number_trade):
-            sim_val = model.gbm_path(1000, mu)[1][-1]
-            profit = np.maximum(sim_val - self.K, 0)*num_contract - premium*num_contract
-            # we use max, because if the stock price is below the strike price at the time of expiry, then we
-            # are not going to use the option therefore the profit is 0, but we always pay the premium for option
-            total_pnls.append(profit)
+        sim_vals = self.terminal_prices(number_trade, mu, rng)
+        total_pnls = np.maximum(sim_vals - self.K, 0, out=sim_vals)
+        total_pnls -= premium
+        total_pnls *= num_contract
+        # we use max, because if the stock price is below the strike price at the time of expiry, then we
+        # are not going to use the option therefore the profit is 0, but we always pay the premium for option
         mean = np.mean(total_pnls)
         equity_curve = np.cumsum(total_pnls)
         return total_pnls, mean, equity_curve
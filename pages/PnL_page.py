@@ -4,11 +4,46 @@ from PyQt6.QtGui import QFont
 from PyQt6.QtCore import Qt
 from superqt import QDoubleRangeSlider
 import main
+from grid_cache import pnl_values
+from result_cache import cached, model_results
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
+from pages.heatmap import HeatmapRenderer
+from pages.param_store import SharedInputs
+from pages.scheduler import UpdateScheduler
+from pages.workers import LatestOnlyWorker
 
-class PnLPage(QWidget):
+
+PNL_QUANTILES = (0.05, 0.5, 0.95)
+
+
+def pnl_summary(params, option_type):
+    # the probability-weighted P&L of one option bought at the model price, from the closed-form distribution
+    d = main.BlackScholesModel(*params).pnl_distribution(option_type=option_type, quantiles=PNL_QUANTILES, size=2)
+    return {key: d[key] for key in ('prob_profit', 'expected', 'std', 'prob_max_loss', 'quantiles')}
+
+
+def compute_pnl_prices(params):
+    # runs on the worker thread
+    results = model_results(params)
+    distribution = cached(lambda: {o: pnl_summary(params, o) for o in 'cp'}, 'pnl_distribution', params)
+    return results['call'], results['put'], distribution
+
+
+def compute_pnl_chart(params, min_mp, max_mp):
+    # runs on the worker thread: call and put P&L grids, so switching between them needs no recompute. Slider
+    # moves only redo the arithmetic on the premium curve cached for these params
+    xc_vals, yc_vals, call_pnl, put_pnl = pnl_values(params, size=8, min_mp=min_mp, max_mp=max_mp)
+    return {
+        'xc_vals': np.round(xc_vals, decimals=2),
+        'yc_vals': np.round(yc_vals, decimals=2),
+        'call_pnl': np.round(call_pnl, decimals=2),
+        'put_pnl': np.round(put_pnl, decimals=2),
+    }
+
+
+class PnLPage(SharedInputs, QWidget):
     def __init__(self):
         super().__init__()
         # Main layout with two columns
@@ -58,6 +93,8 @@ class PnLPage(QWidget):
         inputs_row = QHBoxLayout()
         inputs_row.setSpacing(15)
 
+        self.scheduler = UpdateScheduler.instance()
+
         self.model_inputs = []
         for label, min_val, max_val, default, decimals in input_specs:
             spinbox = QDoubleSpinBox()
@@ -80,8 +117,8 @@ class PnLPage(QWidget):
 
             self.model_inputs.append(spinbox)
             inputs_row.addWidget(spinbox)
-            spinbox.valueChanged.connect(self.calculate_bsm)
 
+        self.bind_inputs()
         for spinbox in self.model_inputs:
             spinbox.setMinimumWidth(120)
 
@@ -187,6 +224,38 @@ class PnLPage(QWidget):
 
         right_layout.addWidget(results_frame)
 
+        # Probability-weighted P&L at expiry of the selected option, bought at the model price
+        distribution_frame = QFrame()
+        distribution_frame.setStyleSheet("background: #2D2D2D; border-radius: 5px;")
+        distribution_layout = QVBoxLayout(distribution_frame)
+        distribution_layout.setContentsMargins(15, 10, 15, 10)
+        distribution_layout.setSpacing(6)
+
+        distribution_title = QLabel("P&L Distribution at Expiry")
+        distribution_title.setFont(QFont("Arial", 10, QFont.Weight.Bold))
+        distribution_title.setStyleSheet("color: #FFFFFF;")
+        distribution_title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        distribution_layout.addWidget(distribution_title)
+
+        distribution_form = QFormLayout()
+        distribution_form.setVerticalSpacing(6)
+        self.prob_profit_value = QLabel("-")
+        self.expected_pnl_value = QLabel("-")
+        self.pnl_std_value = QLabel("-")
+        self.max_loss_prob_value = QLabel("-")
+        self.pnl_quantiles_value = QLabel("-")
+        for val_label in [self.prob_profit_value, self.expected_pnl_value, self.pnl_std_value,
+                          self.max_loss_prob_value, self.pnl_quantiles_value]:
+            val_label.setStyleSheet("color: white; font-size: 13px;")
+        distribution_form.addRow("Prob. of Profit:", self.prob_profit_value)
+        distribution_form.addRow("Expected P&L:", self.expected_pnl_value)
+        distribution_form.addRow("P&L Std Dev:", self.pnl_std_value)
+        distribution_form.addRow("Prob. of Max Loss:", self.max_loss_prob_value)
+        distribution_form.addRow("P&L 5% / 50% / 95%:", self.pnl_quantiles_value)
+        distribution_layout.addLayout(distribution_form)
+
+        right_layout.addWidget(distribution_frame)
+
         # Slider
         slider_container = QWidget()
         slider_layout = QVBoxLayout(slider_container)
@@ -319,9 +388,14 @@ class PnLPage(QWidget):
         self.put_pnl_value = QLabel("-")
         self.call_edge_value = QLabel("-")
         self.put_edge_value = QLabel("-")
+        self.call_iv_value = QLabel("-")
+        self.put_iv_value = QLabel("-")
+        self.call_pop_value = QLabel("-")
+        self.put_pop_value = QLabel("-")
 
         # Styling for value labels
-        for val_label in [self.call_pnl_value, self.put_pnl_value, self.call_edge_value, self.put_edge_value]:
+        for val_label in [self.call_pnl_value, self.put_pnl_value, self.call_edge_value, self.put_edge_value,
+                          self.call_iv_value, self.put_iv_value, self.call_pop_value, self.put_pop_value]:
             val_label.setStyleSheet("color: white; font-size: 14px;")
 
         # Add result label rows
@@ -329,6 +403,10 @@ class PnLPage(QWidget):
         result_form.addRow("Put PnL:", self.put_pnl_value)
         result_form.addRow("Call Trade Edge:", self.call_edge_value)
         result_form.addRow("Put Trade Edge:", self.put_edge_value)
+        result_form.addRow("Call Quote Implied Vol:", self.call_iv_value)
+        result_form.addRow("Put Quote Implied Vol:", self.put_iv_value)
+        result_form.addRow("Call Prob. of Profit:", self.call_pop_value)
+        result_form.addRow("Put Prob. of Profit:", self.put_pop_value)
 
         right_graph_layout.addLayout(result_form)
         self.calculate_button.clicked.connect(self.update_custom_metrics)
@@ -358,10 +436,21 @@ class PnLPage(QWidget):
             spine.set_edgecolor('#555555')
 
         left_graph_layout.addWidget(self.left_canvas)
+        self.pnl_heatmap = HeatmapRenderer(self.left_figure, self.left_canvas, 'Expiry Price range', 'Volatility',
+                                           cmap='RdYlGn', text_color='black')
         left_layout.addWidget(left_graph_container, stretch=1)  # Takes remaining space
 
+        self.chart = None
+        self.distribution = None
+        self.price_worker = LatestOnlyWorker(self)
+        self.price_worker.result_ready.connect(self.show_prices)
+        self.price_worker.failed.connect(lambda message: print(f"P&L pricing error: {message}"))
+        self.chart_worker = LatestOnlyWorker(self)
+        self.chart_worker.result_ready.connect(self.show_chart)
+        self.chart_worker.failed.connect(lambda message: print(f"Heatmap error: {message}"))
+
 #        self.slider.valueChanged.connect(self.plot_call)
-        self.slider.valueChanged.connect(self.update_active_plot)
+        self.slider.valueChanged.connect(self.scheduler.slot(self.update_active_plot))
 
         # Initialize slider values
         self.update_slider_range()
@@ -369,31 +458,41 @@ class PnLPage(QWidget):
         # Connect button signals
         call_btn.clicked.connect(self.plot_call)
         put_btn.clicked.connect(self.plot_put)
+        self.graph_options.idClicked.connect(self.show_distribution)
 
     def update_custom_metrics(self):
         quote = float(self.quote_input.text())
         expiry = float(self.expiry_input.text())
 
-        S = self.model_inputs[0].value()  # Underlying
-        K = self.model_inputs[1].value()  # Strike
-        sigma = self.model_inputs[2].value()  # Volatility (decimal)
-        r = self.model_inputs[3].value()  # Interest rate (decimal)
-        T = self.model_inputs[4].value()  # Time
-
-        Model = main.BlackScholesModel(S, K, sigma, r, T)
+        Model = main.BlackScholesModel(*self.current_params())
         c_pnl_val = Model.prac_call_pnl(quote, expiry)
         p_pnl_val = Model.prac_put_pnl(quote, expiry)
         c_edge = Model.call_trade_edge(quote)
         p_edge = Model.put_trade_edge(quote)
+        c_iv = Model.implied_vol(quote, 'c')
+        p_iv = Model.implied_vol(quote, 'p')
+        # bought at the quote, under the model's lognormal terminal distribution
+        c_pop = Model.pnl_prob_profit(quote, 'c')
+        p_pop = Model.pnl_prob_profit(quote, 'p')
 
         # Replace this with your own calculation logic
         self.call_pnl_value.setText(f"{c_pnl_val:.2f}")
         self.put_pnl_value.setText(f"{p_pnl_val:.2f}")
         self.call_edge_value.setText(f"{c_edge:.2f}")
         self.put_edge_value.setText(f"{p_edge:.2f}")
+        self.call_iv_value.setText(f"{c_iv:.4f}")
+        self.put_iv_value.setText(f"{p_iv:.4f}")
+        self.call_pop_value.setText(f"{c_pop:.2%}")
+        self.put_pop_value.setText(f"{p_pop:.2%}")
 
     def update_active_plot(self):
-        """Handle slider changes by updating the correct plot"""
+        """Queue a recompute of the P&L chart for the current inputs and slider range"""
+        min_value, max_value = self.slider.value()
+        self.chart_worker.submit(compute_pnl_chart, self.current_params(), min_value, max_value)
+
+    def show_chart(self, result):
+        """Handle a finished chart by drawing the correct plot"""
+        self.chart = result
         if self.graph_options.checkedId() == 0:  # Call is selected
             self.plot_call()
         else:  # Put is selected
@@ -420,103 +519,44 @@ class PnLPage(QWidget):
         self.range_label.setText(f"Range: {range_size:.2f}")
 
     def calculate_bsm(self):
-        S = self.model_inputs[0].value()  # Underlying
-        K = self.model_inputs[1].value()  # Strike
-        sigma = self.model_inputs[2].value()  # Volatility (decimal)
-        r = self.model_inputs[3].value()  # Interest rate (decimal)
-        T = self.model_inputs[4].value()  # Time
-
-        Model = main.BlackScholesModel(S, K, sigma, r, T)
-        self.call_price.setText(f"{Model.c_p:.2f}")
-        self.put_price.setText(f"{Model.p_p:.2f}")
-
+        self.price_worker.submit(compute_pnl_prices, self.current_params())
+        # moving the slider requests the plot as well, the scheduler runs it once for both
         self.update_slider_range()
-        self.plot_call()
+        self.scheduler.request(self.update_active_plot)
+
+    def show_prices(self, prices):
+        c_p, p_p, self.distribution = prices
+        self.call_price.setText(f"{c_p:.2f}")
+        self.put_price.setText(f"{p_p:.2f}")
+        self.show_distribution()
+
+    def show_distribution(self):
+        """Fill the P&L distribution panel for the selected option"""
+        if self.distribution is None:
+            return
+        d = self.distribution['c' if self.graph_options.checkedId() == 0 else 'p']
+        self.prob_profit_value.setText(f"{d['prob_profit']:.2%}")
+        self.expected_pnl_value.setText(f"{d['expected']:.2f}")
+        self.pnl_std_value.setText(f"{d['std']:.2f}")
+        self.max_loss_prob_value.setText(f"{d['prob_max_loss']:.2%}")
+        self.pnl_quantiles_value.setText(" / ".join(f"{d['quantiles'][q]:.2f}" for q in PNL_QUANTILES))
 
     def plot_call(self):
         """Plot and update call option P&L heatmap"""
-        self.left_ax.clear()
-        # Add your call option plotting logic here
-        self.left_ax.set_title('Call Option P&L', color='white')
+        if self.chart is None:
+            return
         try:
-            # Get current parameters
-            S = self.model_inputs[0].value()
-            K = self.model_inputs[1].value()
-            sigma = self.model_inputs[2].value()
-            r = self.model_inputs[3].value()
-            T = self.model_inputs[4].value()
-
-            # Get heatmap data from model
-            Model = main.BlackScholesModel(S, K, sigma, r, T)
-            min_value = self.slider.value()[0]
-            max_value = self.slider.value()[1]
-            xc_vals, yc_vals, call_prices, put_prices = Model.theo_pnl_chart(size=8, min_mp=min_value, max_mp=max_value)
-
-            xc_vals = np.round(xc_vals, decimals=2)
-            yc_vals = np.round(yc_vals, decimals=2)
-            call_prices = np.round(call_prices, decimals=2)
-            # Plot Call Prices
-            self.left_figure.clear()
-            left_ax = self.left_figure.add_subplot()
-            c1 = left_ax.imshow(call_prices, cmap='RdYlGn')
-            self.left_figure.colorbar(c1, ax=left_ax)
-            left_ax.set_title('Call Option Theoretical P&L', color='white', pad=20)
-            left_ax.set_xlabel('Expiry Price range', color='white')
-            left_ax.set_ylabel('Volatility', color='white')
-            left_ax.tick_params(colors='white')
-            left_ax.set_facecolor('#3E3E3E')
-            left_ax.set_xticks(range(len(xc_vals)), labels=xc_vals)
-            left_ax.set_yticks(range(len(yc_vals)), labels=yc_vals)
-
-            for i in range(len(xc_vals)):
-                for j in range(len(yc_vals)):
-                    left_ax.text(j, i, call_prices[i, j], ha="center", va="center", color="black")
-
-            self.left_canvas.draw()
-
+            self.pnl_heatmap.update(self.chart['xc_vals'], self.chart['yc_vals'], self.chart['call_pnl'],
+                                    'Call Option Theoretical P&L')
         except Exception as e:
             print(f"Heatmap error: {e}")
 
     def plot_put(self):
         """Plot put option P&L diagram"""
-        self.left_ax.clear()
-        # Add your put option plotting logic here
-        self.left_ax.set_title("Put Option Theoretical P&L", color='white')
+        if self.chart is None:
+            return
         try:
-            # Get current parameters
-            S = self.model_inputs[0].value()
-            K = self.model_inputs[1].value()
-            sigma = self.model_inputs[2].value()
-            r = self.model_inputs[3].value()
-            T = self.model_inputs[4].value()
-
-            # Get heatmap data from model
-            Model = main.BlackScholesModel(S, K, sigma, r, T)
-            min_value = self.slider.value()[0]
-            max_value = self.slider.value()[1]
-            xc_vals, yc_vals, call_prices, put_prices = Model.theo_pnl_chart(size=8, min_mp=min_value, max_mp=max_value)
-
-            xc_vals = np.round(xc_vals, decimals=2)
-            yc_vals = np.round(yc_vals, decimals=2)
-            call_prices = np.round(put_prices, decimals=2)
-            # Plot Call Prices
-            self.left_figure.clear()
-            left_ax = self.left_figure.add_subplot()
-            c1 = left_ax.imshow(call_prices, cmap='RdYlGn')
-            self.left_figure.colorbar(c1, ax=left_ax)
-            left_ax.set_title('Put Option P&L', color='white', pad=20)
-            left_ax.set_xlabel('Expiry Price range', color='white')
-            left_ax.set_ylabel('Volatility', color='white')
-            left_ax.tick_params(colors='white')
-            left_ax.set_facecolor('#3E3E3E')
-            left_ax.set_xticks(range(len(xc_vals)), labels=xc_vals)
-            left_ax.set_yticks(range(len(yc_vals)), labels=yc_vals)
-
-            for i in range(len(xc_vals)):
-                for j in range(len(yc_vals)):
-                    left_ax.text(j, i, call_prices[i, j], ha="center", va="center", color="black")
-
-            self.left_canvas.draw()
-
+            self.pnl_heatmap.update(self.chart['xc_vals'], self.chart['yc_vals'], self.chart['put_pnl'],
+                                    'Put Option P&L')
         except Exception as e:
-            print(f"Heatmap error: {e}")
\ No newline at end of file
+            print(f"Heatmap error: {e}")
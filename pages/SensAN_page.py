@@ -4,11 +4,34 @@ from PyQt6.QtGui import QFont, QPalette, QColor
 from PyQt6.QtCore import Qt
 
 import main
+from result_cache import cached, model_results
+from term_structure import decimate
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import numpy as np
+from pages.param_store import SharedInputs
+from pages.scheduler import UpdateScheduler
+from pages.workers import LatestOnlyWorker
 
-class SensANPage(QWidget):
+THETA_PLOT_POINTS = 400  # per subplot, whatever the maturity
+
+
+def theta_curve_points(params, max_points=THETA_PLOT_POINTS):
+    # the daily theta curve decimated to a bounded number of points, long maturities would otherwise plot
+    # one point per day (18250 at 50 years)
+    time_values, theta_call, theta_put = main.BlackScholesModel(*params).theta_decay_graph()[:3]
+    call_T, theta_call = decimate(time_values, theta_call, max_points)
+    put_T, theta_put = decimate(time_values, theta_put, max_points)
+    return call_T, theta_call, put_T, theta_put
+
+
+def compute_sensitivity(params):
+    # runs on the worker thread: everything the page shows for one parameter set
+    theta_curve = cached(lambda: theta_curve_points(params), 'theta_curve', params)
+    return dict(model_results(params), theta_curve=theta_curve)
+
+
+class SensANPage(SharedInputs, QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout()
@@ -37,6 +60,8 @@ class SensANPage(QWidget):
         inputs_row = QHBoxLayout()
         inputs_row.setSpacing(15)
 
+        self.scheduler = UpdateScheduler.instance()
+
         self.model_inputs = []
         for label, min_val, max_val, default, decimals in input_specs:
             spinbox = QDoubleSpinBox()
@@ -59,8 +84,8 @@ class SensANPage(QWidget):
 
             self.model_inputs.append(spinbox)
             inputs_row.addWidget(spinbox)
-            spinbox.valueChanged.connect(self.calculate_bsm)
 
+        self.bind_inputs()
         inputs_layout.addLayout(inputs_row)
 
         # Results section (same as before)
@@ -163,7 +188,6 @@ class SensANPage(QWidget):
 
         theta_graph_layout.addWidget(self.theta_canvas)
         sensitivity_layout.addWidget(theta_graph_frame, stretch=2)
-        self.plot_theta_graph()
 
         # === RIGHT: Calculated Labels ===
         label_container = QFrame()
@@ -229,7 +253,13 @@ class SensANPage(QWidget):
         label_layout.addLayout(column3)
 
         sensitivity_layout.addWidget(label_container, stretch=1)
-        self.update_stats_values()
+
+        self.worker = LatestOnlyWorker(self)
+        self.worker.result_ready.connect(self.show_results)
+        self.worker.failed.connect(lambda message: print(f"Sensitivity error: {message}"))
+
+        # Initial draw
+        self.show_results(compute_sensitivity(self.current_params()))
 
         # Finally, add the full container to your main layout
         self.layout.addWidget(sensitivity_container)
@@ -244,35 +274,23 @@ class SensANPage(QWidget):
         self.setPalette(palette)
 
     def calculate_bsm(self):
-        S = self.model_inputs[0].value()  # Underlying
-        K = self.model_inputs[1].value()  # Strike
-        sigma = self.model_inputs[2].value()  # Volatility (decimal)
-        r = self.model_inputs[3].value()  # Interest rate (decimal)
-        T = self.model_inputs[4].value()  # Time
-
-        Model = main.BlackScholesModel(S, K, sigma, r, T)
-        self.call_price.setText(f"{Model.c_p:.2f}")
-        self.put_price.setText(f"{Model.p_p:.2f}")
-
-        self.plot_theta_graph()
-        self.update_stats_values()
-
-    def update_stats_values(self):
-        S = self.model_inputs[0].value()  # Underlying
-        K = self.model_inputs[1].value()  # Strike
-        sigma = self.model_inputs[2].value()  # Volatility (decimal)
-        r = self.model_inputs[3].value()  # Interest rate (decimal)
-        T = self.model_inputs[4].value()  # Time
-
-        Model = main.BlackScholesModel(S, K, sigma, r, T)
-        sens_an = Model.sensitivity_analysis()
-        thetas = Model.thetas()
-        tval = Model.time_value()
-        intval = Model.int_value()
-        pcp = Model.put_call_parity()
-        bec = Model.breakeven_call()
-        bep = Model.breakeven_put()
+        self.worker.submit(compute_sensitivity, self.current_params())
+
+    def show_results(self, result):
+        self.call_price.setText(f"{result['call']:.2f}")
+        self.put_price.setText(f"{result['put']:.2f}")
+
+        self.plot_theta_graph(*result['theta_curve'])
+        self.update_stats_values(result)
 
+    def update_stats_values(self, result):
+        sens_an = result['sens_an']
+        thetas = result['thetas']
+        tval = result['tval']
+        intval = result['intval']
+        pcp = result['pcp']
+        bec = result['bec']
+        bep = result['bep']
 
         self.theta_call_label.setText(f"Theta Call: {thetas[0]:.4f}")
         self.theta_put_label.setText(f"Theta Put: {thetas[1]:.4f}")
@@ -294,26 +312,20 @@ class SensANPage(QWidget):
 
 
 
-    def plot_theta_graph(self):
-        try:
-            # Get current input values
-            S = self.model_inputs[0].value()
-            K = self.model_inputs[1].value()
-            sigma = self.model_inputs[2].value()
-            r = self.model_inputs[3].value()
-            T = self.model_inputs[4].value()
-
-            # Call your model
-            Model = main.BlackScholesModel(S, K, sigma, r, T)
-            time_values, theta_call, theta_put, _, _ = Model.theta_decay_graph()
+    @staticmethod
+    def marker(time_values):
+        # point markers only while they can still be told apart
+        return 'o' if len(time_values) <= 100 else None
 
+    def plot_theta_graph(self, call_T, theta_call, put_T, theta_put):
+        try:
             # Clear figure and create 2 subplots side-by-side
             self.theta_fig.clear()
             fig_axes = self.theta_fig.subplots(1, 2)  # (rows=1, cols=2)
 
             # --- Call Theta subplot --- (Remember you also have the theta decay call graph/365)
             ax1 = fig_axes[0]
-            ax1.plot(time_values, theta_call, marker='o', color='cyan', linestyle='-')
+            ax1.plot(call_T, theta_call, marker=self.marker(call_T), color='cyan', linestyle='-')
             ax1.set_title('Call Theta Decay', color='white')
             ax1.set_xlabel('Time to Expiry', color='white')
             ax1.set_ylabel('Time Value in years', color='white')
@@ -324,7 +336,7 @@ class SensANPage(QWidget):
 
             # --- Put Theta subplot --- (Remember you also have the theta decay put graph/365)
             ax2 = fig_axes[1]
-            ax2.plot(time_values, theta_put, marker='o', color='magenta', linestyle='-')
+            ax2.plot(put_T, theta_put, marker=self.marker(put_T), color='magenta', linestyle='-')
             ax2.set_title('Put Theta Decay', color='white')
             ax2.set_xlabel('Time to Expiry', color='white')
             ax2.set_ylabel('Time Value in years', color='white')
@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class HeatmapRenderer:
+    """Annotated heatmap whose artists are created once and updated in place
+
+    The axes, AxesImage, colorbar and one text artist per cell are only rebuilt when the grid size changes.
+    Every other update goes through set_data/set_clim/set_text and a draw_idle, so a redraw no longer
+    re-creates hundreds of artists.
+    """
+
+    def __init__(self, figure, canvas, xlabel, ylabel, cmap=None, text_color='w'):
+        self.figure = figure
+        self.canvas = canvas
+        self.xlabel = xlabel
+        self.ylabel = ylabel
+        self.cmap = cmap
+        self.text_color = text_color
+        self.shape = None
+        self.ax = None
+        self.image = None
+        self.colorbar = None
+        self.texts = []
+
+    def _build(self, shape):
+        self.figure.clear()
+        self.ax = self.figure.add_subplot()
+        self.image = self.ax.imshow(np.zeros(shape), cmap=self.cmap)
+        self.colorbar = self.figure.colorbar(self.image, ax=self.ax)
+        self.ax.set_xlabel(self.xlabel, color='white')
+        self.ax.set_ylabel(self.ylabel, color='white')
+        self.ax.tick_params(colors='white')
+        self.ax.set_facecolor('#3E3E3E')
+        self.texts = [self.ax.text(j, i, '', ha="center", va="center", color=self.text_color)
+                      for i in range(shape[0]) for j in range(shape[1])]
+        self.shape = shape
+
+    def update(self, x_vals, y_vals, values, title):
+        values = np.asarray(values)
+        if values.shape != self.shape:
+            self._build(values.shape)
+        self.image.set_data(values)
+        self.image.set_clim(values.min(), values.max())
+        self.ax.set_title(title, color='white', pad=20)
+        self.ax.set_xticks(range(len(x_vals)), labels=x_vals)
+        self.ax.set_yticks(range(len(y_vals)), labels=y_vals)
+        for text, value in zip(self.texts, values.flat):
+            text.set_text(str(value))
+        self.canvas.draw_idle()
@@ -9,10 +9,32 @@ matplotlib.use('Qt5Agg')  # Use Qt6 backend for PyQt6
 from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg  # Note: 'qtagg' not 'qt5agg'
 from matplotlib.figure import Figure
 import numpy as np
-import main
+from grid_cache import heatmap_values
+from result_cache import cached, model_results
+from pages.heatmap import HeatmapRenderer
+from pages.param_store import SharedInputs
+from pages.scheduler import UpdateScheduler
+from pages.workers import LatestOnlyWorker
 
 
-class HomePage(QWidget):
+def heatmap_grid(params, size):
+    xc_vals, yc_vals, call_prices, put_prices = heatmap_values(params, size=size)
+    return {
+        'xc_vals': np.round(xc_vals, decimals=2),
+        'yc_vals': np.round(yc_vals, decimals=2),
+        'call_prices': np.round(call_prices, decimals=2),
+        'put_prices': np.round(put_prices, decimals=2),
+    }
+
+
+def compute_home(params, size):
+    # runs on the worker thread: prices and heatmap grids for one parameter set, no Qt or matplotlib here
+    results = model_results(params)
+    grid = cached(lambda: heatmap_grid(params, size), 'heatmap', params, size)
+    return dict(grid, call=results['call'], put=results['put'])
+
+
+class HomePage(SharedInputs, QWidget):
     def __init__(self):
         super().__init__()
         self.layout = QVBoxLayout()
@@ -67,7 +89,6 @@ class HomePage(QWidget):
 
             self.model_inputs.append(spinbox)
             inputs_row.addWidget(spinbox)
-            spinbox.valueChanged.connect(self.calculate_bsm)
 
         inputs_layout.addLayout(inputs_row)
         self.layout.addWidget(inputs_frame)
@@ -262,6 +283,9 @@ class HomePage(QWidget):
         self.canvas2.setStyleSheet("background-color: transparent;")
         heatmap2_container.addWidget(self.canvas2)
 
+        self.call_heatmap = HeatmapRenderer(self.figure1, self.canvas1, 'Strike Price', 'Volatility')
+        self.put_heatmap = HeatmapRenderer(self.figure2, self.canvas2, 'Strike Price', 'Volatility')
+
         # Add to layout with stretch factors
         heatmaps_row.addLayout(heatmap1_container, stretch=1)
         heatmaps_row.addLayout(heatmap2_container, stretch=1)
@@ -270,16 +294,20 @@ class HomePage(QWidget):
         # Add to main layout with stretch
         self.layout.addWidget(heatmap_frame, stretch=1)
 
-        # Initial draw
-        self.update_heatmaps()
+        self.worker = LatestOnlyWorker(self)
+        self.worker.result_ready.connect(self.show_results)
+        self.worker.failed.connect(lambda message: print(f"Heatmap error: {message}"))
 
         # Connections
         self.size_slider.valueChanged.connect(
             lambda value: self.size_value.setText(str(value))
         )
-        self.size_slider.valueChanged.connect(self.update_heatmaps)
-        for spinbox in self.model_inputs:
-            spinbox.valueChanged.connect(self.update_heatmaps)
+        self.scheduler = UpdateScheduler.instance()
+        self.size_slider.valueChanged.connect(self.scheduler.slot(self.calculate_bsm))
+        self.bind_inputs()
+
+        # Initial draw
+        self.show_results(compute_home(self.current_params(), self.size_slider.value()))
 
     def set_dark_theme(self):
         palette = QPalette()
@@ -290,69 +318,23 @@ class HomePage(QWidget):
         self.setPalette(palette)
 
     def calculate_bsm(self):
+        """Queue a recompute of the prices and heatmaps for the current inputs"""
+        self.worker.submit(compute_home, self.current_params(), self.size_slider.value())
 
-        S = self.model_inputs[0].value()  # Underlying
-        K = self.model_inputs[1].value()  # Strike
-        sigma = self.model_inputs[2].value()  # Volatility (decimal)
-        r = self.model_inputs[3].value()  # Interest rate (decimal)
-        T = self.model_inputs[4].value()  # Time
-
-        Model = main.BlackScholesModel(S, K, sigma, r, T)
-        self.call_price.setText(f"{Model.c_p:.2f}")
-        self.put_price.setText(f"{Model.p_p:.2f}")
+    def show_results(self, result):
+        self.call_price.setText(f"{result['call']:.2f}")
+        self.put_price.setText(f"{result['put']:.2f}")
+        self.update_heatmaps(result)
 
-    def update_heatmaps(self):
+    def update_heatmaps(self, result):
         """Update heatmaps with model data"""
         try:
-            # Get current parameters
-            S = self.model_inputs[0].value()
-            K = self.model_inputs[1].value()
-            sigma = self.model_inputs[2].value()
-            r = self.model_inputs[3].value()
-            T = self.model_inputs[4].value()
-
-            # Get heatmap data from model
-            Model = main.BlackScholesModel(S, K, sigma, r, T)
-            xc_vals, yc_vals, call_prices, put_prices = Model.cp_heatmap_val(size=self.size_slider.value())
-
-            xc_vals = np.round(xc_vals, decimals=2)
-            yc_vals = np.round(yc_vals, decimals=2)
-            call_prices = np.round(call_prices, decimals=2)
-            put_prices = np.round(put_prices, decimals=2)
-            # Plot Call Prices
-            self.figure1.clear()
-            ax1 = self.figure1.add_subplot()
-            c1 = ax1.imshow(call_prices)
-            self.figure1.colorbar(c1, ax=ax1)
-            ax1.set_title('Call Prices', color='white', pad=20)
-            ax1.set_xlabel('Strike Price', color='white')
-            ax1.set_ylabel('Volatility', color='white')
-            ax1.tick_params(colors='white')
-            ax1.set_facecolor('#3E3E3E')
-            ax1.set_xticks(range(len(xc_vals)), labels=xc_vals)
-            ax1.set_yticks(range(len(yc_vals)), labels=yc_vals)
-
-            # Plot Put Prices
-            self.figure2.clear()
-            ax2 = self.figure2.add_subplot()
-            c2 = ax2.imshow(put_prices)
-            self.figure2.colorbar(c2, ax=ax2)
-            ax2.set_title('Put Prices', color='white', pad=20)
-            ax2.set_xlabel('Strike Price', color='white')
-            ax2.set_ylabel('Volatility', color='white')
-            ax2.tick_params(colors='white')
-            ax2.set_facecolor('#3E3E3E')
-            ax2.set_xticks(range(len(xc_vals)), labels=xc_vals)
-            ax2.set_yticks(range(len(yc_vals)), labels=yc_vals)
-
-            for i in range(len(xc_vals)):
-                for j in range(len(yc_vals)):
-                    ax1.text(j, i, call_prices[i, j], ha="center", va="center", color="w")
-                    ax2.text(j, i, put_prices[i, j], ha="center", va="center", color="w")
-
-            # Redraw
-            self.canvas1.draw()
-            self.canvas2.draw()
+            xc_vals = result['xc_vals']
+            yc_vals = result['yc_vals']
+            call_prices = result['call_prices']
+            put_prices = result['put_prices']
+            self.call_heatmap.update(xc_vals, yc_vals, call_prices, 'Call Prices')
+            self.put_heatmap.update(xc_vals, yc_vals, put_prices, 'Put Prices')
 
         except Exception as e:
             print(f"Heatmap error: {e}")
\ No newline at end of file
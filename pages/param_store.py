@@ -0,0 +1,68 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+from result_cache import model_cache
+
+
+class ParameterStore(QObject):
+    """Application-wide (S, K, sigma, r, T) shared by all pages
+
+    Every page writes its spinbox edits here and listens to changed, so the inputs stay in sync across pages
+    and the results computed for one page are found in the shared result cache by the others.
+    """
+    changed = pyqtSignal(tuple)
+    DEFAULTS = (100.00, 100.00, 0.2000, 0.0300, 1.00)
+    _instance = None
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._params = list(self.DEFAULTS)
+        self.cache = model_cache
+
+    @classmethod
+    def instance(cls):
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def params(self):
+        return tuple(self._params)
+
+    def set_value(self, index, value):
+        if self._params[index] == value:
+            return
+        self._params[index] = value
+        self.changed.emit(self.params())
+
+
+class SharedInputs:
+    # mixin for pages whose model_inputs spinboxes mirror the ParameterStore, the page provides
+    # calculate_bsm() and self.scheduler
+    def bind_inputs(self):
+        self.store = ParameterStore.instance()
+        self.stale = False
+        for index, (spinbox, value) in enumerate(zip(self.model_inputs, self.store.params())):
+            spinbox.setValue(value)
+            spinbox.valueChanged.connect(lambda value, i=index: self.store.set_value(i, value))
+        self.store.changed.connect(self.on_params_changed)
+
+    def current_params(self):
+        # (S, K, sigma, r, T) shared by all pages
+        return self.store.params()
+
+    def on_params_changed(self, params):
+        # mirror the shared inputs without re-emitting, only the page on screen recomputes right away,
+        # hidden pages catch up from the result cache when they are shown
+        for spinbox, value in zip(self.model_inputs, params):
+            spinbox.blockSignals(True)
+            spinbox.setValue(value)
+            spinbox.blockSignals(False)
+        if self.isVisible():
+            self.scheduler.request(self.calculate_bsm)
+        else:
+            self.stale = True
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.stale:
+            self.stale = False
+            self.calculate_bsm()
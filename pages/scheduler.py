@@ -0,0 +1,60 @@
+from PyQt6.QtCore import QObject, QTimer
+
+
+class UpdateScheduler(QObject):
+    """Coalesce bursts of input changes into one recompute per interval
+
+    Widgets request a callback instead of calling it. The first request of a burst starts a single-shot
+    timer, every further request before it fires is merged, so each distinct callback runs once per interval
+    no matter how many signals fired. Callbacks that request other callbacks while the queue is flushed
+    (e.g. a price update that moves a slider) are run in the same flush.
+    """
+    _instance = None
+
+    def __init__(self, interval_ms=16, parent=None):
+        super().__init__(parent)
+        self._queued = {}  # dict as an ordered set of callbacks
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self.requests = 0
+        self.recomputes = 0
+
+    @classmethod
+    def instance(cls):
+        # the application-wide scheduler shared by all pages
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def set_interval(self, interval_ms):
+        # the debounce interval in milliseconds, 16 ms is one frame at 60 Hz
+        self._timer.setInterval(interval_ms)
+
+    def interval(self):
+        return self._timer.interval()
+
+    @property
+    def skipped(self):
+        # number of requests that were merged into another recompute
+        return self.requests - self.recomputes
+
+    def request(self, callback):
+        self.requests += 1
+        self._queued[callback] = None
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def slot(self, callback):
+        # a slot for any signal that schedules callback, the signal arguments are ignored
+        return lambda *args: self.request(callback)
+
+    def flush(self):
+        while self._queued:
+            callbacks = list(self._queued)
+            self._queued.clear()
+            for callback in callbacks:
+                self.recomputes += 1
+                callback()
+        self._timer.stop()
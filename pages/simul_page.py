@@ -1,8 +1,352 @@
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel
+import time
 
+import numpy as np
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QFrame, QDoubleSpinBox, QSpinBox,
+                             QComboBox, QCheckBox, QPushButton, QProgressBar, QLineEdit)
+from PyQt6.QtGui import QFont, QPalette, QColor
+from PyQt6.QtCore import Qt
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+from matplotlib.figure import Figure
 
-class SimulationPage(QWidget):
+import exotics
+from main import BlackScholesModel
+from pages.param_store import SharedInputs
+from pages.scheduler import UpdateScheduler
+from pages.workers import StreamingJob
+
+Z_95 = 1.96
+PATH_BUFFER = 2_000_000  # floats per chunk of paths (16 MB), the chunk size shrinks as the number of steps grows
+REDRAW_INTERVAL = 0.25  # seconds between two redraws of the convergence plot while a run streams in
+
+
+def run_simulation(params, settings, stop):
+    # runs on the worker thread: yields (stats, elapsed seconds) after every chunk of paths and ends early
+    # once the 95% half-width is within the error target
+    model = BlackScholesModel(*params)
+    payoff, control = exotics.make_payoff(model, settings['kind'], settings['n_steps'], settings['option_type'],
+                                          settings['barrier'], settings['barrier_type'], settings['strike'])
+    chunk_size = max(1000, min(100_000, PATH_BUFFER // (settings['n_steps'] + 1)))
+    target = settings['target']
+    started = time.perf_counter()
+    for stats in exotics.simulate(model, payoff, settings['n_paths'], settings['n_steps'], chunk_size,
+                                  control=control if settings['control'] else None, stop=stop):
+        yield stats, time.perf_counter() - started
+        if target > 0 and Z_95*stats.stderr <= target:
+            return
+
+
+class SimulationPage(SharedInputs, QWidget):
     def __init__(self):
         super().__init__()
-        layout = QVBoxLayout()
-        self.setLayout(layout)
\ No newline at end of file
+        self.layout = QVBoxLayout()
+        self.setLayout(self.layout)
+        self.set_dark_theme()
+
+        spin_style = """
+            QDoubleSpinBox, QSpinBox, QComboBox {
+                background: #3E3E3E;
+                color: #FFFFFF;
+                border: 1px solid #555555;
+                padding: 5px;
+            }
+        """
+
+        inputs_frame = QFrame()
+        inputs_frame.setStyleSheet("background: #2D2D2D; border-radius: 5px;")
+        inputs_layout = QVBoxLayout(inputs_frame)
+        inputs_layout.setContentsMargins(10, 10, 10, 10)
+
+        title_label = QLabel("Model Inputs")
+        title_label.setFont(QFont("Arial", 14, QFont.Weight.Bold))
+        title_label.setStyleSheet("color: #FFFFFF;")
+        title_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        inputs_layout.addWidget(title_label)
+
+        input_specs = [
+            ("Underlying price:", 0.01, 10000.00, 100.00, 2),  # 2 decimals
+            ("Strike price:", 0.01, 10000.00, 100.00, 2),  # 2 decimals
+            ("Volatility:", 0.0000, 2.0000, 0.2000, 4),  # 4 decimals
+            ("Interest rate:", -0.0500, 0.2000, 0.0300, 4),  # 4 decimals
+            ("Time to expiration:", 0.01, 50.00, 1.00, 2)  # 2 decimals
+        ]
+
+        inputs_row = QHBoxLayout()
+        inputs_row.setSpacing(15)
+
+        self.scheduler = UpdateScheduler.instance()
+
+        self.model_inputs = []
+        for label, min_val, max_val, default, decimals in input_specs:
+            spinbox = QDoubleSpinBox()
+            spinbox.setPrefix(f"{label} ")
+            spinbox.setDecimals(decimals)
+            spinbox.setSingleStep(0.01 if decimals == 2 else 0.0001)
+            spinbox.setRange(min_val, max_val)
+            spinbox.setValue(default)
+            spinbox.setButtonSymbols(QDoubleSpinBox.ButtonSymbols.UpDownArrows)
+            spinbox.setMinimumWidth(140)
+            spinbox.setAlignment(Qt.AlignmentFlag.AlignRight)
+            spinbox.setStyleSheet(spin_style)
+            self.model_inputs.append(spinbox)
+            inputs_row.addWidget(spinbox)
+
+        self.bind_inputs()
+        inputs_layout.addLayout(inputs_row)
+
+        # Simulation settings
+        settings_row = QHBoxLayout()
+        settings_row.setSpacing(15)
+
+        self.kind_box = QComboBox()
+        self.kind_box.addItems(["Asian", "Barrier", "Lookback"])
+        self.type_box = QComboBox()
+        self.type_box.addItems(["Call", "Put"])
+        self.barrier_type_box = QComboBox()
+        self.barrier_type_box.addItems(exotics.BARRIER_TYPES)
+        self.barrier_level = QDoubleSpinBox()
+        self.barrier_level.setPrefix("Barrier: ")
+        self.barrier_level.setRange(0.01, 20000.00)
+        self.barrier_level.setValue(120.00)
+        self.strike_box = QComboBox()
+        self.strike_box.addItems(exotics.LOOKBACK_STRIKES)
+
+        self.steps_input = QSpinBox()
+        self.steps_input.setPrefix("Steps: ")
+        self.steps_input.setRange(1, 1000)
+        self.steps_input.setValue(50)
+        self.paths_input = QSpinBox()
+        self.paths_input.setPrefix("Paths: ")
+        self.paths_input.setRange(100_000, 10_000_000)
+        self.paths_input.setSingleStep(100_000)
+        self.paths_input.setValue(1_000_000)
+        self.paths_input.setGroupSeparatorShown(True)
+        self.target_input = QDoubleSpinBox()
+        self.target_input.setPrefix("Error target: ")
+        self.target_input.setDecimals(4)
+        self.target_input.setRange(0.0, 10.0)
+        self.target_input.setSingleStep(0.001)
+        self.target_input.setValue(0.005)
+        self.target_input.setToolTip("stop once the 95% confidence half-width is below this, 0 runs every path")
+
+        self.control_box = QCheckBox("Control variate")
+        self.control_box.setChecked(True)
+        self.control_box.setStyleSheet("color: #FFFFFF;")
+
+        for widget in (self.kind_box, self.type_box, self.barrier_type_box, self.barrier_level, self.strike_box,
+                       self.steps_input, self.paths_input, self.target_input):
+            widget.setStyleSheet(spin_style)
+            settings_row.addWidget(widget)
+        settings_row.addWidget(self.control_box)
+
+        button_style = """
+            QPushButton {
+                background: #3E3E3E;
+                color: #FFFFFF;
+                border: 1px solid #555555;
+                padding: 6px 18px;
+            }
+            QPushButton:disabled { color: #777777; }
+        """
+        self.start_button = QPushButton("Start")
+        self.stop_button = QPushButton("Stop")
+        self.stop_button.setEnabled(False)
+        for button in (self.start_button, self.stop_button):
+            button.setStyleSheet(button_style)
+            settings_row.addWidget(button)
+        self.start_button.clicked.connect(self.start_simulation)
+        self.stop_button.clicked.connect(self.stop_simulation)
+        self.kind_box.currentIndexChanged.connect(self.update_settings_visibility)
+        self.update_settings_visibility()
+
+        inputs_layout.addLayout(settings_row)
+
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 1000)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.setFixedHeight(8)
+        inputs_layout.addWidget(self.progress_bar)
+
+        # Results section
+        results_frame = QFrame()
+        results_frame.setStyleSheet("background: #2D2D2D; border-radius: 5px;")
+        results_layout = QVBoxLayout(results_frame)
+        results_layout.setContentsMargins(20, 10, 20, 10)
+
+        price_label = QLabel("Monte Carlo Price")
+        price_label.setFont(QFont("Arial", 12, QFont.Weight.Bold))
+        price_label.setStyleSheet("color: #FFFFFF;")
+        price_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        results_layout.addWidget(price_label)
+
+        self.price_display = QLineEdit("-")
+        self.price_display.setReadOnly(True)
+        self.price_display.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.price_display.setMinimumWidth(180)
+        self.price_display.setStyleSheet("""
+                        QLineEdit {
+                            font: bold 18px 'Arial';
+                            color: #00AAFF;
+                            background: #003350;
+                            border: 2px solid #0077AA;
+                            border-radius: 5px;
+                            padding: 8px;
+                            min-height: 32px;
+                        }
+                    """)
+        results_layout.addWidget(self.price_display)
+
+        def create_label(text):
+            lbl = QLabel(text)
+            lbl.setStyleSheet("color: white; font-size: 14px;")
+            return lbl
+
+        self.stderr_label = create_label("Std Error: -")
+        self.ci_label = create_label("95% CI: -")
+        self.paths_label = create_label("Paths: -")
+        self.time_label = create_label("Elapsed: -")
+        self.status_label = create_label("Press Start to simulate")
+        for label in (self.stderr_label, self.ci_label, self.paths_label, self.time_label, self.status_label):
+            results_layout.addWidget(label)
+        results_frame.setFixedWidth(380)
+
+        upper_container = QFrame()
+        upper_container.setStyleSheet("background: none;")
+        upper_layout = QHBoxLayout(upper_container)
+        upper_layout.setContentsMargins(10, 10, 0, 10)
+        upper_layout.setSpacing(20)
+        upper_layout.addWidget(inputs_frame, stretch=2)
+        upper_layout.addWidget(results_frame, stretch=1)
+        self.layout.addWidget(upper_container)
+
+        # Convergence graph
+        graph_frame = QFrame()
+        graph_frame.setStyleSheet("background-color: #2D2D2D; border-radius: 8px;")
+        graph_layout = QVBoxLayout(graph_frame)
+        graph_layout.setContentsMargins(10, 10, 10, 10)
+
+        self.fig = Figure(figsize=(10, 4), dpi=100)
+        self.canvas = FigureCanvas(self.fig)
+        self.ax = self.fig.add_subplot(111)
+        self.fig.patch.set_facecolor("#2D2D2D")
+        graph_layout.addWidget(self.canvas)
+        self.layout.addWidget(graph_frame, stretch=1)
+
+        self.job = None
+        self.history = []
+        self.last_draw = 0.0
+        self.plot_convergence()
+
+    def set_dark_theme(self):
+        palette = QPalette()
+        palette.setColor(QPalette.ColorRole.Window, QColor(40, 40, 40))
+        palette.setColor(QPalette.ColorRole.WindowText, Qt.GlobalColor.white)
+        palette.setColor(QPalette.ColorRole.Base, QColor(45, 45, 45))
+        palette.setColor(QPalette.ColorRole.Text, Qt.GlobalColor.white)
+        self.setPalette(palette)
+
+    def update_settings_visibility(self):
+        kind = self.kind_box.currentText()
+        self.barrier_type_box.setVisible(kind == "Barrier")
+        self.barrier_level.setVisible(kind == "Barrier")
+        self.strike_box.setVisible(kind == "Lookback")
+
+    def settings(self):
+        return {
+            'kind': self.kind_box.currentText().lower(),
+            'option_type': 'c' if self.type_box.currentText() == "Call" else 'p',
+            'barrier': self.barrier_level.value(),
+            'barrier_type': self.barrier_type_box.currentText(),
+            'strike': self.strike_box.currentText(),
+            'n_steps': self.steps_input.value(),
+            'n_paths': self.paths_input.value(),
+            'target': self.target_input.value(),
+            'control': self.control_box.isChecked(),
+        }
+
+    def calculate_bsm(self):
+        # a run is only meaningful for the inputs it started with, a change stops it instead of restarting
+        # a simulation of up to 1e7 paths on every spinbox click
+        if self.job is not None:
+            self.stop_simulation()
+        if self.history:
+            self.status_label.setText("Inputs changed, press Start to rerun")
+
+    def start_simulation(self):
+        if self.job is not None:
+            return
+        self.history = []
+        self.last_draw = 0.0
+        self.progress_bar.setValue(0)
+        self.status_label.setText("Running...")
+        self.start_button.setEnabled(False)
+        self.stop_button.setEnabled(True)
+        self.job = StreamingJob(run_simulation, self.current_params(), self.settings())
+        self.job.signals.partial.connect(self.on_partial)
+        self.job.signals.done.connect(self.on_done)
+        self.job.start()
+
+    def stop_simulation(self):
+        if self.job is not None:
+            self.job.cancel()
+            self.stop_button.setEnabled(False)
+            self.status_label.setText("Stopping...")
+
+    def on_partial(self, result):
+        stats, elapsed = result
+        self.history.append((stats.n, stats.mean, stats.stderr))
+        self.show_stats(stats, elapsed)
+        self.progress_bar.setValue(int(1000*stats.n/self.paths_input.value()))
+        now = time.perf_counter()
+        if now - self.last_draw >= REDRAW_INTERVAL:
+            self.last_draw = now
+            self.plot_convergence()
+
+    def on_done(self, ok, result):
+        job, self.job = self.job, None
+        self.start_button.setEnabled(True)
+        self.stop_button.setEnabled(False)
+        if not ok:
+            self.status_label.setText(f"Simulation error: {result}")
+            return
+        if result is not None:
+            stats, elapsed = result
+            target = job.args[1]['target']
+            if job.stop.is_set():
+                self.status_label.setText("Stopped")
+            elif target > 0 and Z_95*stats.stderr <= target:
+                self.status_label.setText(f"Error target reached after {stats.n:,} paths")
+                self.progress_bar.setValue(1000)
+            else:
+                self.status_label.setText("Done")
+        self.plot_convergence()
+
+    def show_stats(self, stats, elapsed):
+        low, high = stats.confidence_interval(Z_95)
+        self.price_display.setText(f"{stats.mean:.4f}")
+        self.stderr_label.setText(f"Std Error: {stats.stderr:.5f}")
+        self.ci_label.setText(f"95% CI: [{low:.4f}, {high:.4f}]")
+        self.paths_label.setText(f"Paths: {stats.n:,}")
+        self.time_label.setText(f"Elapsed: {elapsed:.2f}s ({stats.n/max(elapsed, 1e-9)/1e6:.2f}M paths/s)")
+
+    def plot_convergence(self):
+        try:
+            ax = self.ax
+            ax.clear()
+            ax.set_facecolor('#3E3E3E')
+            ax.set_title('Price Estimate vs Paths', color='white')
+            ax.set_xlabel('Paths', color='white')
+            ax.set_ylabel('Price', color='white')
+            ax.tick_params(colors='white')
+            for spine in ax.spines.values():
+                spine.set_edgecolor('#555555')
+            if self.history:
+                n, mean, stderr = (np.array(column) for column in zip(*self.history))
+                ax.fill_between(n, mean - Z_95*stderr, mean + Z_95*stderr, color='cyan', alpha=0.25,
+                                label='95% CI')
+                ax.plot(n, mean, color='cyan', label='Estimate')
+                ax.set_xscale('log')
+                ax.legend(facecolor='#2D2D2D', edgecolor='#555555', labelcolor='white')
+            self.fig.tight_layout(pad=2.0)
+            self.canvas.draw()
+        except Exception as e:
+            print(f"Simulation graph error: {e}")
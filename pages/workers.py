@@ -0,0 +1,152 @@
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+class _JobSignals(QObject):
+    # lives in the GUI thread, so emitting from the pool thread queues the slot call back onto the event loop
+    done = pyqtSignal(bool, object)
+
+
+class _Job(QRunnable):
+    def __init__(self, fn, args):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.signals = _JobSignals()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args)
+        except Exception as e:
+            self.signals.done.emit(False, str(e))
+        else:
+            self.signals.done.emit(True, result)
+
+
+class LatestOnlyWorker(QObject):
+    """Run model computations on the shared QThreadPool, delivering only the newest result
+
+    At most one job per worker runs at a time. Requests that arrive while it is busy replace each other,
+    so only the latest parameter set is computed next and every stale request in between is dropped.
+    The result of a job that was overtaken by a newer request is discarded instead of rendered.
+    """
+    result_ready = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, pool=None):
+        super().__init__(parent)
+        self.pool = pool if pool is not None else QThreadPool.globalInstance()
+        self._job = None
+        self._pending = None
+        self.dropped = 0
+
+    def submit(self, fn, *args):
+        if self._job is not None:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (fn, args)
+            return
+        self._start(fn, args)
+
+    def busy(self):
+        return self._job is not None
+
+    def _start(self, fn, args):
+        # the reference keeps the job (and its signal object) alive until its result has been handled
+        self._job = _Job(fn, args)
+        self._job.signals.done.connect(self._on_done)
+        self.pool.start(self._job)
+
+    def _on_done(self, ok, payload):
+        self._job = None
+        if self._pending is not None:
+            # the inputs changed while this job was running, its result is already stale
+            self.dropped += 1
+            fn, args = self._pending
+            self._pending = None
+            self._start(fn, args)
+        elif ok:
+            self.result_ready.emit(payload)
+        else:
+            self.failed.emit(payload)
+
+
+class _ProgressSignals(QObject):
+    progress = pyqtSignal(float)
+    done = pyqtSignal(bool, object)
+
+
+class ProgressJob(QRunnable):
+    """A long task for the shared QThreadPool that reports its progress and can be stopped
+
+    fn is called as fn(*args, progress=callback, stop=event): callback(done, total) emits progress as a fraction,
+    stop is a threading.Event set by cancel() that fn checks between units of work. Keep a reference to the job
+    until done has been emitted.
+    """
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.stop = threading.Event()
+        self.signals = _ProgressSignals()
+
+    def start(self, pool=None):
+        (pool if pool is not None else QThreadPool.globalInstance()).start(self)
+
+    def cancel(self):
+        self.stop.set()
+
+    def _report(self, done, total):
+        self.signals.progress.emit(done/total if total else 1.0)
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self._report, stop=self.stop)
+        except Exception as e:
+            self.signals.done.emit(False, str(e))
+        else:
+            self.signals.done.emit(True, result)
+
+
+class _StreamingSignals(QObject):
+    partial = pyqtSignal(object)
+    done = pyqtSignal(bool, object)
+
+
+class StreamingJob(QRunnable):
+    """A long task for the shared QThreadPool that streams intermediate results
+
+    fn(*args, stop=event) is a generator, every value it yields is emitted as partial and the last one again with
+    done(True, last). stop is a threading.Event set by cancel(), the job also stops pulling values once it is set,
+    so a generator that never checks it still ends after its current step. Keep a reference to the job until done
+    has been emitted.
+    """
+
+    def __init__(self, fn, *args):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn = fn
+        self.args = args
+        self.stop = threading.Event()
+        self.signals = _StreamingSignals()
+
+    def start(self, pool=None):
+        (pool if pool is not None else QThreadPool.globalInstance()).start(self)
+
+    def cancel(self):
+        self.stop.set()
+
+    def run(self):
+        last = None
+        try:
+            for last in self.fn(*self.args, stop=self.stop):
+                self.signals.partial.emit(last)
+                if self.stop.is_set():
+                    break
+        except Exception as e:
+            self.signals.done.emit(False, str(e))
+        else:
+            self.signals.done.emit(True, last)
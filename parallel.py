@@ -0,0 +1,187 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import norm_backend
+from chain import OptionChain, call_mask
+from implied_vol import implied_vol
+
+# Multi-core execution layer for chain pricing and Monte Carlo.
+#
+# The work is cut into fixed-size blocks of block_size rows that are independent of the number of workers. Input
+# and output arrays live in shared memory: workers attach to them by name and read/write their block in place, no
+# array is pickled. Random numbers come from one SeedSequence spawned into one child per block, so block b draws
+# the same numbers whichever worker runs it. Together this makes the results bit-identical for any number of
+# workers, workers=1 runs the very same block function in this process over the same shared buffers.
+
+DEFAULT_BLOCK_SIZE = 1 << 16
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+class _SharedArrays:
+    # named numpy arrays backed by shared memory blocks, spec() describes them for attach() in a worker
+    def __init__(self):
+        self.blocks = {}
+        self.arrays = {}
+
+    def add(self, name, shape, dtype, values=None):
+        dtype = np.dtype(dtype)
+        size = max(int(np.prod(shape))*dtype.itemsize, 1)
+        block = shared_memory.SharedMemory(create=True, size=size)
+        self.blocks[name] = block
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        if values is not None:
+            array[...] = values
+        self.arrays[name] = array
+        return array
+
+    def spec(self):
+        return {name: (self.blocks[name].name, array.shape, array.dtype.str) for name, array in self.arrays.items()}
+
+    def close(self):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            block.unlink()
+        self.blocks.clear()
+
+
+def _attach(spec):
+    blocks = {name: shared_memory.SharedMemory(name=block_name) for name, (block_name, _, _) in spec.items()}
+    arrays = {name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=blocks[name].buf)
+              for name, (_, shape, dtype) in spec.items()}
+    return blocks, arrays
+
+
+def _run_blocks(fn, spec, n, block_size, blocks, backend, args):
+    # worker entry point: runs fn on every block index in blocks
+    shm, arrays = _attach(spec)
+    try:
+        with norm_backend.use_backend(backend):
+            for b in blocks:
+                start = b*block_size
+                fn(b, slice(start, min(start + block_size, n)), arrays, *args)
+    finally:
+        del arrays
+        for block in shm.values():
+            block.close()
+
+
+def run_blocks(fn, n, inputs, outputs, block_size=DEFAULT_BLOCK_SIZE, workers=None, args=(), pool=None):
+    """Run fn(block_index, rows, arrays, *args) over range(n) in blocks of block_size rows
+
+    inputs maps names to arrays of n rows and outputs maps names to dtypes (or (dtype, shape) for outputs that are
+    not n rows long). fn reads arrays[name][rows] and writes its results to the output arrays in place; it has to
+    be a module-level function. The blocks are dealt round-robin to the workers of pool (a ProcessPoolExecutor,
+    a new one with `workers` processes is used if None). Returns the output arrays.
+    """
+    if workers is None:
+        workers = default_workers()
+    n_blocks = -(-n//block_size)
+    shared = _SharedArrays()
+    try:
+        for name, values in inputs.items():
+            values = np.asarray(values)
+            shared.add(name, values.shape, values.dtype, values)
+        for name, dtype in outputs.items():
+            dtype, shape = dtype if isinstance(dtype, tuple) else (dtype, (n,))
+            shared.add(name, shape, dtype)
+        spec = shared.spec()
+        backend = norm_backend.get_backend()
+        if workers <= 1 or n_blocks <= 1:
+            _run_blocks(fn, spec, n, block_size, range(n_blocks), backend, args)
+        else:
+            tasks = [range(w, n_blocks, workers) for w in range(min(workers, n_blocks))]
+            own_pool = pool is None
+            pool = ProcessPoolExecutor(max_workers=len(tasks)) if own_pool else pool
+            try:
+                futures = [pool.submit(_run_blocks, fn, spec, n, block_size, task, backend, args) for task in tasks]
+                for future in futures:
+                    future.result()
+            finally:
+                if own_pool:
+                    pool.shutdown()
+        return {name: shared.arrays[name].copy() for name in outputs}
+    finally:
+        shared.close()
+
+
+# chain pricing
+
+CHAIN_OUTPUTS = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')
+
+
+def _price_block(b, rows, arrays):
+    chain = OptionChain(*(arrays[c][rows] for c in ('S', 'K', 'sigma', 'r', 't')), option_type=arrays['is_call'][rows],
+                        dtype=arrays['S'].dtype)
+    priced = chain.price()
+    for column in CHAIN_OUTPUTS:
+        arrays[column][rows] = priced[column]
+
+
+def price_chain(S, K, sigma, r, t, option_type='c', dtype=np.float64, workers=None, block_size=DEFAULT_BLOCK_SIZE,
+                pool=None):
+    # chain.price_chain sharded over a process pool, returns price and greeks
+    columns = np.broadcast_arrays(*(np.asarray(c, dtype=dtype) for c in (S, K, sigma, r, t)))
+    columns = [np.atleast_1d(c) for c in columns]
+    n = len(columns[0])
+    inputs = dict(zip(('S', 'K', 'sigma', 'r', 't'), columns), is_call=call_mask(option_type, n))
+    return run_blocks(_price_block, n, inputs, dict.fromkeys(CHAIN_OUTPUTS, dtype), block_size, workers, pool=pool)
+
+
+def _iv_block(b, rows, arrays):
+    iv, converged = implied_vol(*(arrays[c][rows] for c in ('quote', 'S', 'K', 'r', 't')), arrays['is_call'][rows])
+    arrays['iv'][rows] = iv
+    arrays['iv_converged'][rows] = converged
+
+
+def implied_vols(price, S, K, r, t, option_type='c', workers=None, block_size=DEFAULT_BLOCK_SIZE, pool=None):
+    # implied_vol.implied_vol sharded over a process pool, returns iv and iv_converged
+    columns = np.broadcast_arrays(*(np.asarray(c, dtype=np.float64) for c in (price, S, K, r, t)))
+    columns = [np.atleast_1d(c) for c in columns]
+    n = len(columns[0])
+    inputs = dict(zip(('quote', 'S', 'K', 'r', 't'), columns), is_call=call_mask(option_type, n))
+    return run_blocks(_iv_block, n, inputs, {'iv': np.float64, 'iv_converged': bool}, block_size, workers, pool=pool)
+
+
+# Monte Carlo
+
+def block_generator(seed, b):
+    # the stream of block b: child b of SeedSequence(seed).spawn(), built directly from its spawn key
+    return np.random.Generator(np.random.PCG64DXSM(np.random.SeedSequence(seed, spawn_key=(b,))))
+
+
+def _pnl_block(b, rows, arrays, S, K, sigma, mu, t, premium, num_contract, seed):
+    # terminal prices of this block, sampled as in BlackScholesModel.terminal_prices, then the call P&L
+    out = arrays['pnl'][rows]
+    block_generator(seed, b).standard_normal(out=out)
+    out *= sigma*np.sqrt(t)
+    out += (mu - 0.5*sigma**2)*t
+    np.exp(out, out=out)
+    out *= S
+    out -= K
+    np.maximum(out, 0, out=out)
+    out -= premium
+    out *= num_contract
+
+
+def c_pnl_edge_simul(model, premium, num_contract, number_trade, mu=None, seed=None, workers=None,
+                     block_size=DEFAULT_BLOCK_SIZE, pool=None):
+    """BlackScholesModel.c_pnl_edge_simul sharded over a process pool
+
+    Returns (total_pnls, mean, equity_curve) like the model method. seed is anything np.random.SeedSequence
+    accepts, fresh entropy if None; the same seed and block_size give bit-identical results for any workers.
+    """
+    if mu is None:
+        mu = model.r
+    if seed is None:
+        seed = np.random.SeedSequence().entropy
+    args = (model.S, model.K, model.sigma, mu, model.t, premium, num_contract, seed)
+    total_pnls = run_blocks(_pnl_block, number_trade, {}, {'pnl': np.float64}, block_size, workers, args, pool)['pnl']
+    # the reductions run over the whole array in this process, their summation order never depends on workers
+    return total_pnls, np.mean(total_pnls), np.cumsum(total_pnls)
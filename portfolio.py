@@ -0,0 +1,306 @@
+import numpy as np
+
+from chain import OptionChain, call_mask
+
+# Option books priced as columns.
+#
+# A Portfolio keeps its positions in struct-of-arrays layout like OptionChain: quantity, strike, time to expiry,
+# volatility, type, underlying id and the cost paid per unit, one entry per position in growable arrays. The
+# market (spot and volatility per underlying, one rate) is held separately. Unit prices and greeks of every
+# position are kept next to the columns and the book totals per underlying are kept as running sums, so:
+#   add               prices only the new rows and adds them to the totals
+#   update / close    subtract the old contribution of the rows, reprice them (not for a quantity change) and add
+#                     the new one
+#   set_market        reprices the positions of that underlying only
+#   set_rate, advance reprice everything, reprice() also resets the rounding the running sums pick up
+# A position's volatility is NaN when it follows the volatility of its underlying.
+
+FIELDS = ('price', 'delta', 'gamma', 'vega', 'theta', 'rho')
+COLUMNS = ('quantity', 'K', 't', 'sigma', 'is_call', 'underlying', 'cost')
+
+
+class Portfolio:
+
+    def __init__(self, spots, vols, r=0.0, multiplier=1.0, capacity=1024, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        self.spot = np.atleast_1d(np.asarray(spots, dtype=self.dtype)).copy()
+        self.vol = np.broadcast_to(np.asarray(vols, dtype=self.dtype), self.spot.shape).copy()
+        self.r = r
+        self.multiplier = multiplier
+        self.n = 0
+        self._columns = {name: np.zeros(capacity, dtype=self._dtype(name)) for name in COLUMNS}
+        self._unit = {field: np.zeros(capacity, dtype=self.dtype) for field in FIELDS}
+        self.totals = {field: np.zeros(len(self.spot)) for field in FIELDS + ('cost',)}
+
+    def _dtype(self, name):
+        return {'is_call': bool, 'underlying': np.intp}.get(name, self.dtype)
+
+    def __len__(self):
+        return self.n
+
+    def __getattr__(self, name):
+        # the position columns, e.g. book.K, as views of the filled rows
+        columns = self.__dict__.get('_columns')
+        if columns is not None and name in columns:
+            return columns[name][:self.n]
+        raise AttributeError(name)
+
+    # pricing
+
+    def _grow(self, extra):
+        capacity = len(self._columns['K'])
+        if self.n + extra <= capacity:
+            return
+        capacity = max(2*capacity, self.n + extra)
+        for store in (self._columns, self._unit):
+            for name, values in store.items():
+                grown = np.zeros(capacity, dtype=values.dtype)
+                grown[:self.n] = values[:self.n]
+                store[name] = grown
+
+    def _price(self, rows):
+        # unit price and greeks of the rows at the current market, expired positions are worth their
+        # intrinsic value and only keep a delta
+        c = self._columns
+        underlying = c['underlying'][rows]
+        S = self.spot[underlying]
+        K, t, is_call = c['K'][rows], c['t'][rows], c['is_call'][rows]
+        sigma = c['sigma'][rows]
+        sigma = np.where(np.isnan(sigma), self.vol[underlying], sigma)
+        live = t > 0
+        unit = {field: np.zeros(len(rows), dtype=self.dtype) for field in FIELDS}
+        if live.any():
+            priced = OptionChain(S[live], K[live], sigma[live], self.r, t[live], is_call[live], self.dtype).price()
+            for field in FIELDS:
+                unit[field][live] = priced[field]
+        expired = ~live
+        if expired.any():
+            w = np.where(is_call[expired], 1, -1)
+            intrinsic = np.maximum(w*(S[expired] - K[expired]), 0)
+            unit['price'][expired] = intrinsic
+            unit['delta'][expired] = np.where(intrinsic > 0, w, 0)
+        for field in FIELDS:
+            self._unit[field][rows] = unit[field]
+
+    def _accumulate(self, rows, sign=1):
+        # add (sign=1) or remove (sign=-1) the contribution of the rows to the totals per underlying
+        c = self._columns
+        underlying = c['underlying'][rows]
+        weight = sign*self.multiplier*c['quantity'][rows]
+        size = len(self.spot)
+        for field in FIELDS:
+            self.totals[field] += np.bincount(underlying, weight*self._unit[field][rows], minlength=size)
+        self.totals['cost'] += np.bincount(underlying, weight*c['cost'][rows], minlength=size)
+
+    def reprice(self):
+        rows = np.arange(self.n)
+        self._price(rows)
+        for total in self.totals.values():
+            total[:] = 0
+        self._accumulate(rows)
+
+    # positions
+
+    def add(self, underlying=0, quantity=1, K=None, t=None, option_type='c', sigma=np.nan, cost=None):
+        """Append positions (scalars are broadcast), returns their ids
+
+        quantity is signed (negative = short), sigma NaN follows the underlying's volatility and cost is the
+        price paid per unit, the model price when None so a new position starts at zero P&L.
+        """
+        underlying, quantity, K, t, sigma = np.broadcast_arrays(
+            np.asarray(underlying, dtype=np.intp), np.asarray(quantity, dtype=self.dtype),
+            np.asarray(K, dtype=self.dtype), np.asarray(t, dtype=self.dtype), np.asarray(sigma, dtype=self.dtype))
+        count = underlying.size
+        if count and (underlying.min() < 0 or underlying.max() >= len(self.spot)):
+            raise ValueError(f"underlying ids must be in 0..{len(self.spot) - 1}")
+        self._grow(count)
+        rows = np.arange(self.n, self.n + count)
+        c = self._columns
+        c['underlying'][rows] = underlying.ravel()
+        c['quantity'][rows] = quantity.ravel()
+        c['K'][rows] = K.ravel()
+        c['t'][rows] = t.ravel()
+        c['sigma'][rows] = sigma.ravel()
+        c['is_call'][rows] = call_mask(option_type, count)
+        self.n += count
+        self._price(rows)
+        c['cost'][rows] = self._unit['price'][rows] if cost is None else np.broadcast_to(cost, (count,))
+        self._accumulate(rows)
+        return rows
+
+    def add_strategy(self, legs, underlying=0, cost=None):
+        # legs as returned by the strategy helpers below
+        return self.add(underlying, legs['quantity'], legs['K'], legs['t'], legs['option_type'], cost=cost)
+
+    def update(self, ids, quantity=None, K=None, t=None, sigma=None, option_type=None, cost=None):
+        # change fields of existing positions, only these rows are repriced (and only if more than the quantity
+        # or cost changed)
+        rows = np.atleast_1d(np.asarray(ids, dtype=np.intp))
+        self._accumulate(rows, -1)
+        c = self._columns
+        for name, value in (('quantity', quantity), ('K', K), ('t', t), ('sigma', sigma), ('cost', cost)):
+            if value is not None:
+                c[name][rows] = value
+        if option_type is not None:
+            c['is_call'][rows] = call_mask(option_type, len(rows))
+        if any(value is not None for value in (K, t, sigma, option_type)):
+            self._price(rows)
+        self._accumulate(rows)
+
+    def close(self, ids):
+        # a closed position has quantity 0 and no longer counts, compact() drops it
+        self.update(ids, quantity=0)
+
+    def compact(self):
+        # drops the closed positions, returns the new id of every old id (-1 for dropped ones)
+        keep = self.quantity != 0
+        new_ids = np.full(self.n, -1, dtype=np.intp)
+        new_ids[keep] = np.arange(keep.sum())
+        for store in (self._columns, self._unit):
+            for name, values in store.items():
+                kept = values[:self.n][keep]
+                values[:len(kept)] = kept
+        self.n = int(keep.sum())
+        return new_ids
+
+    # market
+
+    def set_market(self, underlying, spot=None, vol=None):
+        # reprices the positions on this underlying only
+        if spot is not None:
+            self.spot[underlying] = spot
+        if vol is not None:
+            self.vol[underlying] = vol
+        rows = np.flatnonzero(self.underlying == underlying)
+        self._accumulate(rows, -1)
+        self._price(rows)
+        self._accumulate(rows)
+
+    def set_rate(self, r):
+        self.r = r
+        self.reprice()
+
+    def advance(self, dt):
+        # let dt years pass, positions expiring on the way are kept at their intrinsic value
+        self._columns['t'][:self.n] -= dt
+        self.reprice()
+
+    # results
+
+    def value(self, underlying=None):
+        return self._total('price', underlying)
+
+    def cost(self, underlying=None):
+        return self._total('cost', underlying)
+
+    def pnl(self, underlying=None):
+        return self.value(underlying) - self.cost(underlying)
+
+    def greeks(self, underlying=None):
+        # book greeks, summed over the underlyings unless one is given (delta and gamma are per underlying's
+        # own spot, their sum over several underlyings is only meaningful as a share count)
+        return {field: self._total(field, underlying) for field in FIELDS[1:]}
+
+    def _total(self, field, underlying):
+        totals = self.totals[field]
+        return float(totals.sum() if underlying is None else totals[underlying])
+
+    def positions(self):
+        # the position columns with the value and greeks of every position (quantity and multiplier included)
+        weight = self.multiplier*self.quantity
+        result = {name: self._columns[name][:self.n].copy() for name in COLUMNS}
+        result.update({field: weight*self._unit[field][:self.n] for field in FIELDS})
+        return result
+
+    def payoff_curve(self, prices, underlying=0):
+        """Total payoff of the positions on underlying at the expiry prices, every leg at its own expiry
+
+        The payoff is piecewise linear with kinks at the strikes: with the call legs sorted by strike, the calls
+        in the money at S pay S*sum(q) - sum(q*K) over the strikes below S (puts mirrored), so the curve takes
+        one sort and a searchsorted instead of prices x positions evaluations.
+        """
+        prices = np.asarray(prices, dtype=float)
+        on = self.underlying == underlying
+        quantity = self.multiplier*self.quantity[on]
+        K, is_call = self.K[on], self.is_call[on]
+        payoff = np.zeros(prices.shape)
+        for legs, sign in ((is_call, 1), (~is_call, -1)):
+            order = np.argsort(K[legs])
+            strikes, q = K[legs][order], quantity[legs][order]
+            q_sum = np.concatenate([[0], np.cumsum(q)])
+            qk_sum = np.concatenate([[0], np.cumsum(q*strikes)])
+            below = np.searchsorted(strikes, prices, side='right')
+            if sign == 1:
+                payoff += prices*q_sum[below] - qk_sum[below]
+            else:
+                payoff += (qk_sum[-1] - qk_sum[below]) - prices*(q_sum[-1] - q_sum[below])
+        return payoff
+
+    def value_curve(self, prices, underlying=0, horizon=0.0, max_rows=1_000_000):
+        # model value of the positions on underlying if its spot moved to each of prices after horizon years,
+        # the other market inputs unchanged; positions expiring before the horizon count at intrinsic value
+        prices = np.atleast_1d(np.asarray(prices, dtype=float))
+        rows = np.flatnonzero(self.underlying == underlying)
+        c = self._columns
+        quantity = self.multiplier*c['quantity'][rows]
+        K, is_call = c['K'][rows], c['is_call'][rows]
+        t = c['t'][rows] - horizon
+        sigma = np.where(np.isnan(c['sigma'][rows]), self.vol[underlying], c['sigma'][rows])
+        live = t > 0
+        values = np.empty(prices.shape)
+        # blocks of grid points, at most max_rows option evaluations at a time
+        step = max(1, max_rows // max(live.sum(), 1))
+        for start in range(0, len(prices), step):
+            block = prices[start:start + step]
+            value = np.zeros(len(block))
+            if live.any():
+                priced = OptionChain(np.repeat(block, live.sum()), np.tile(K[live], len(block)),
+                                     np.tile(sigma[live], len(block)), self.r, np.tile(t[live], len(block)),
+                                     np.tile(is_call[live], len(block)), self.dtype).price()['price']
+                value += priced.reshape(len(block), -1) @ quantity[live]
+            if (~live).any():
+                w = np.where(is_call[~live], 1, -1)
+                value += np.maximum(w*(block[:, None] - K[~live]), 0) @ quantity[~live]
+            values[start:start + step] = value
+        return values
+
+    def pnl_curve(self, prices, underlying=0, horizon=None):
+        # P&L of the positions on underlying over the prices: at expiry (payoff_curve) when horizon is None,
+        # otherwise marked to model after horizon years (value_curve)
+        if horizon is None:
+            curve = self.payoff_curve(prices, underlying)
+        else:
+            curve = self.value_curve(prices, underlying, horizon)
+        return curve - self.cost(underlying)
+
+
+# strategy legs for Portfolio.add_strategy, quantity scales every leg (negative sells the strategy)
+
+def _legs(quantity, legs, t):
+    quantity_, K, option_type = (np.array(column) for column in zip(*legs))
+    return {'quantity': quantity*quantity_.astype(float), 'K': K.astype(float), 't': t, 'option_type': option_type}
+
+
+def vertical_spread(K_low, K_high, t, option_type='c', quantity=1):
+    # bull call spread (long K_low call, short K_high call) or bear put spread (long K_high put, short K_low put)
+    if option_type == 'c':
+        return _legs(quantity, [(1, K_low, 'c'), (-1, K_high, 'c')], t)
+    return _legs(quantity, [(1, K_high, 'p'), (-1, K_low, 'p')], t)
+
+
+def straddle(K, t, quantity=1):
+    return _legs(quantity, [(1, K, 'c'), (1, K, 'p')], t)
+
+
+def strangle(K_put, K_call, t, quantity=1):
+    return _legs(quantity, [(1, K_put, 'p'), (1, K_call, 'c')], t)
+
+
+def butterfly(K_low, K_mid, K_high, t, option_type='c', quantity=1):
+    return _legs(quantity, [(1, K_low, option_type), (-2, K_mid, option_type), (1, K_high, option_type)], t)
+
+
+def iron_condor(K_put_long, K_put_short, K_call_short, K_call_long, t, quantity=1):
+    # short iron condor: sells the K_put_short/K_call_short strangle, buys the wings
+    return _legs(quantity, [(1, K_put_long, 'p'), (-1, K_put_short, 'p'), (-1, K_call_short, 'c'),
+                            (1, K_call_long, 'c')], t)
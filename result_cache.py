@@ -0,0 +1,79 @@
+import threading
+from collections import OrderedDict
+
+import main
+
+# LRU cache for model results shared by every page (and safe to use from worker threads). Keys are built from
+# the parameter tuple rounded to a fixed number of decimals, so (100.0, 100.0, 0.2, 0.03, 1.0) coming from any
+# page maps to the same entry.
+
+
+def param_key(params, decimals=6):
+    return tuple(round(float(p), decimals) for p in params)
+
+
+class ResultCache:
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        # computed outside the lock so workers don't serialise on each other, two threads missing on the
+        # same key at once both compute it and the later one wins
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries),
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+model_cache = ResultCache()
+
+
+def cached(compute, kind, params, *extra):
+    # memoize compute() under (kind, rounded params, *extra) in the shared cache
+    return model_cache.get((kind, param_key(params)) + extra, compute)
+
+
+def _model_results(params):
+    Model = main.BlackScholesModel(*params)
+    return {
+        'call': Model.c_p,
+        'put': Model.p_p,
+        'sens_an': Model.sensitivity_analysis(),
+        'thetas': Model.thetas(),
+        'tval': Model.time_value(),
+        'intval': Model.int_value(),
+        'pcp': Model.put_call_parity(),
+        'bec': Model.breakeven_call(),
+        'bep': Model.breakeven_put(),
+    }
+
+
+def model_results(params):
+    # prices, greeks and the other single-option statistics of one (S, K, sigma, r, T) parameter set
+    return cached(lambda: _model_results(params), 'model', params)
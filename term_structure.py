@@ -0,0 +1,79 @@
+import numpy as np
+
+# Time grids for Greek term structures and plot decimation.
+#
+# A term structure is a Greek evaluated over times to expiry T in (0, t], the closed forms are vectorized so the
+# resolution is whatever the grid asks for (see BlackScholesModel.term_structure). The grids:
+#   'linear'   - n evenly spaced times, the old daily theta curve is linear with n = t*365
+#   'log'      - n log-spaced times, dense near expiry where theta blows up like 1/sqrt(T)
+#   'adaptive' - starts from a coarse log grid and bisects the intervals where the curve is not linear, so the
+#                points end up where the curve bends (see adaptive_time_grid)
+# decimate keeps the number of plotted points bounded however long the series is.
+
+SPACINGS = ('linear', 'log', 'adaptive')
+
+
+def default_t_min(t):
+    # one day, or half the maturity for options that expire within a day
+    return min(1/365, t/2)
+
+
+def time_grid(t, n, spacing='linear', t_min=None):
+    if t_min is None:
+        t_min = default_t_min(t)
+    n = max(int(n), 2)
+    if spacing == 'linear':
+        return np.linspace(t_min, t, n)
+    elif spacing == 'log':
+        return np.geomspace(t_min, t, n)
+    raise ValueError(f"spacing must be 'linear' or 'log', got {spacing!r}")
+
+
+def adaptive_time_grid(f, t, n_max=256, t_min=None, tol=1e-3, n_init=17):
+    # f maps an array of times to an array of values (or a (k, len(T)) stack of curves). An interval is split
+    # while its midpoint is further than tol * (range of the curve) from the chord, the worst intervals first
+    # once n_max would be exceeded
+    if t_min is None:
+        t_min = default_t_min(t)
+    T = np.geomspace(t_min, t, min(n_init, n_max))
+    values = np.atleast_2d(f(T))
+    scale = np.ptp(values, axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    while len(T) < n_max:
+        mid = (T[:-1] + T[1:])/2
+        mid_values = np.atleast_2d(f(mid))
+        chord = (values[:, :-1] + values[:, 1:])/2
+        error = (np.abs(mid_values - chord)/scale).max(axis=0)
+        split = np.flatnonzero(error > tol)
+        if split.size == 0:
+            break
+        budget = n_max - len(T)
+        if split.size > budget:
+            split = np.sort(split[np.argsort(error[split])[-budget:]])
+        # every split interval i gets its midpoint inserted after T[i]
+        T = np.insert(T, split + 1, mid[split])
+        values = np.insert(values, split + 1, mid_values[:, split], axis=1)
+    return T
+
+
+def decimate(x, y, max_points=400):
+    # min/max decimation: the series is cut into max_points/2 buckets and only the smallest and largest y of each
+    # bucket are kept (in x order), so spikes and the curve's envelope survive while the point count is bounded
+    x = np.asarray(x)
+    y = np.asarray(y)
+    n = len(x)
+    if n <= max_points:
+        return x, y
+    n_buckets = max((max_points - 2)//2, 1)  # room for the two end points
+    edges = np.linspace(0, n, n_buckets + 1).astype(np.intp)
+    starts = edges[:-1]
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(edges))
+    # first index of each bucket's min and max
+    i_lo = np.flatnonzero(y == lo[bucket])
+    i_lo = i_lo[np.unique(bucket[i_lo], return_index=True)[1]]
+    i_hi = np.flatnonzero(y == hi[bucket])
+    i_hi = i_hi[np.unique(bucket[i_hi], return_index=True)[1]]
+    keep = np.unique(np.concatenate([i_lo, i_hi, [0, n - 1]]))
+    return x[keep], y[keep]
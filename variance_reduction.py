@@ -0,0 +1,128 @@
+import numpy as np
+from scipy import special
+
+# Variance reduction for the Monte Carlo estimators of the model.
+#
+# An estimator is a payoff of standard normal draws, every method below changes how the normals are drawn or how
+# the payoff samples are combined and returns the estimate together with its standard error:
+#   'plain'       iid normals, stderr = std/sqrt(n)
+#   'antithetic'  z and -z in pairs, the pair averages are iid and cancel the odd part of the payoff
+#   'control'     y - beta*(x - E[x]) for a control x with a closed-form mean, beta fitted by least squares
+#   'moment'      iid normals shifted and scaled to sample mean 0 and variance 1 exactly, the draws are no longer
+#                 independent so the reported stderr is the plain one, a (usually conservative) approximation
+#   'sobol'       scrambled Sobol points mapped through the inverse normal cdf, `replicates` independent
+#                 scramblings give the stderr from the spread of their means
+
+METHODS = ('plain', 'antithetic', 'control', 'moment', 'sobol')
+
+
+def antithetic_normals(n, rng):
+    # 2*ceil(n/2) normals, the second half is the negated first half
+    z = rng.standard_normal(-(-n//2))
+    return np.concatenate([z, -z])
+
+
+def moment_matched_normals(n, rng):
+    z = rng.standard_normal(n)
+    if n > 1:
+        z -= z.mean()
+        z /= z.std()
+    return z
+
+
+def sobol_normals(n, rng, replicates=16):
+    # (replicates, m) normals, m the power of two >= n/replicates so every replicate is a balanced Sobol set
+    from scipy.stats import qmc
+
+    m = max(int(np.ceil(np.log2(max(n/replicates, 1)))), 1)
+    z = np.empty((replicates, 2**m))
+    for i in range(replicates):
+        u = qmc.Sobol(d=1, scramble=True, seed=rng).random_base2(m).ravel()
+        z[i] = special.ndtri(u)
+    return z
+
+
+def normals(n, rng, method='plain', replicates=16):
+    # exactly n normals in sample order, for callers that need one sample per draw rather than the estimate:
+    # 'antithetic' interleaves the pairs (z0, -z0, z1, -z1, ...) so any even prefix is balanced, 'sobol' is the
+    # flattened replicates cut to n, 'plain' and 'control' are iid
+    if method in ('plain', 'control'):
+        return rng.standard_normal(n)
+    if method == 'antithetic':
+        z = rng.standard_normal(-(-n//2))
+        return np.column_stack([z, -z]).ravel()[:n]
+    if method == 'moment':
+        return moment_matched_normals(n, rng)
+    if method == 'sobol':
+        return sobol_normals(n, rng, replicates).ravel()[:n]
+    raise ValueError(f"method must be one of {', '.join(METHODS)}, got {method!r}")
+
+
+def control_beta(y, x):
+    # least-squares coefficient cov(y, x)/var(x) of the control x, 0 for a constant control
+    x_dev = x - x.mean()
+    var = np.dot(x_dev, x_dev)
+    return np.dot(y - y.mean(), x_dev)/var if var > 0 else 0.0
+
+
+def control_variate(y, x, x_mean, beta=None):
+    # y adjusted by the control x whose expectation x_mean is known, beta is fitted on y and x if not given
+    if beta is None:
+        beta = control_beta(y, x)
+    return y - beta*(x - x_mean)
+
+
+def stderr(samples):
+    n = samples.size
+    return samples.std(ddof=1)/np.sqrt(n) if n > 1 else np.inf
+
+
+def estimate(payoff, n, rng, method='plain', control=None, replicates=16):
+    """Monte Carlo estimate of E[payoff(Z)] with Z standard normal, returns (samples, mean, stderr)
+
+    payoff maps an array of normals to an array of samples of the same shape. control, needed for
+    method='control', maps the same normals to (control samples, their known expectation). samples are the
+    iid values the estimate averages: the pair averages for 'antithetic', the adjusted samples for 'control' and
+    every sample (flattened) for 'sobol'.
+    """
+    if method == 'plain':
+        samples = payoff(rng.standard_normal(n))
+    elif method == 'antithetic':
+        z = antithetic_normals(n, rng)
+        y = payoff(z)
+        half = len(z)//2
+        samples = (y[:half] + y[half:])/2
+    elif method == 'control':
+        if control is None:
+            raise ValueError("method='control' needs a control")
+        z = rng.standard_normal(n)
+        x, x_mean = control(z)
+        samples = control_variate(payoff(z), x, x_mean)
+    elif method == 'moment':
+        samples = payoff(moment_matched_normals(n, rng))
+    elif method == 'sobol':
+        y = payoff(sobol_normals(n, rng, replicates))
+        means = y.mean(axis=1)
+        return y.ravel(), means.mean(), means.std(ddof=1)/np.sqrt(replicates)
+    else:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}, got {method!r}")
+    return samples, samples.mean(), stderr(samples)
+
+
+def samples(payoff, n, rng, method='plain', control=None, replicates=16):
+    """n payoff samples, one per draw of normals(n, rng, method), and the estimate of their mean
+
+    Unlike estimate the samples are not combined: both legs of an antithetic pair are kept and sobol is cut to n,
+    so the result lines up one to one with n simulated trades. The samples are always the raw payoffs, with
+    method='control' only the returned mean is adjusted by the control (beta fitted on these n). The samples of
+    'antithetic', 'moment' and 'sobol' are not independent, their standard error comes from estimate.
+    """
+    z = normals(n, rng, method, replicates)
+    if method == 'control':
+        if control is None:
+            raise ValueError("method='control' needs a control")
+        x, x_mean = control(z)
+        y = payoff(z)
+        return y, control_variate(y, x, x_mean).mean() if n else np.nan
+    y = payoff(z)
+    return y, y.mean() if n else np.nan